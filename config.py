@@ -1,5 +1,6 @@
 # APPLICATION CREDENTIALS
-APPLICATION_HOST  = 'localhost'
-APPLICATION_PORT  = 8001
-BATCH_SIZE        = 20
-WORKERS           = 4
+APPLICATION_HOST     = 'localhost'
+APPLICATION_PORT     = 8001
+BATCH_SIZE           = 20
+WORKERS              = 4
+MAX_WAIT_MS          = 50
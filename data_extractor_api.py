@@ -1,36 +1,50 @@
 # DEPENDENCIES
-import os
-import signal
+import logging
 import asyncio
+import functools
 import uvicorn
-import warnings
 from typing import List
+from itertools import chain
 from config import WORKERS
 from fastapi import FastAPI
 from fastapi import Request
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from config import BATCH_SIZE
+from config import MAX_WAIT_MS
 from config import APPLICATION_HOST
 from config import APPLICATION_PORT
 from src.logging_config import setup_logging
+from src.logging_config import RequestLogger
 from src.pydantic_input_classes import InputItemGpt
 from src.pydantic_output_classes import OutputItemGpt
-from src.processing_functions import process_item_gpt
+from src.pydantic_output_classes import OUTPUT_ITEMS_ADAPTER
+from src.batch_scheduler import BatchScheduler
+from src.rate_limiter import share_rate_limit
+from src.model_config import POSTS_PER_REQUEST
+from src.processing_functions import process_items_gpt
+from src.llm_cache import close_llm_cache
+from src.gpt_client_creator import close_openai_client
 from src.shutdown_handler import handle_shutdown_event
 from src.shutdown_middleware import ShutdownMiddleware
-from src.shutdown_handler import handle_shutdown_signal
+from src.shutdown_handler import install_shutdown_signal_handlers
 from src.request_id_middleware import RequestIDMiddleware
 
 
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+# LOGGER FOR THIS MODULE, THE HANDLERS ARE CONFIGURED PER WORKER ON STARTUP
+logger = logging.getLogger(__name__)
 
 
-# CONFIGURE THE LOGGING
-logger = setup_logging()
+# INITIALIZING FASTAPI APPLICATION
+data_extractor_application = FastAPI(default_response_class = ORJSONResponse)
 
 
-# INITIALIZING FASTAPI APPLICATION
-data_extractor_application = FastAPI()
+# COMPRESS RESPONSES OF AT LEAST 1 KB (THE EXTRACTION RESULTS) FOR CLIENTS ACCEPTING GZIP, THE MIDDLEWARE 
+# ADDED LAST IS THE OUTERMOST, SO THIS ONE STAYS BELOW THE REQUEST ID AND SHUTDOWN MIDDLEWARES
+data_extractor_application.add_middleware(GZipMiddleware, 
+                                          minimum_size  = 1024, 
+                                          compresslevel = 5)
 
 
 # ADD CUSTOM MIDDLEWARES
@@ -41,6 +55,33 @@ data_extractor_application.add_middleware(ShutdownMiddleware)
 data_extractor_application.add_middleware(RequestIDMiddleware)
 
 
+# EVERY WORKER PROCESS GETS ITS SHARE OF THE ACCOUNT-WIDE RPM LIMIT
+share_rate_limit(process_count = WORKERS)
+
+
+# SHARED BATCH SCHEDULER FOR ALL INCOMING REQUESTS
+batch_scheduler = BatchScheduler(max_batch_size    = BATCH_SIZE,
+                                 max_wait_ms       = MAX_WAIT_MS,
+                                 posts_per_request = POSTS_PER_REQUEST,
+                                )
+
+
+# REGISTER THE STARTUP EVENT HANDLER
+@data_extractor_application.on_event(event_type = "startup")
+async def startup():
+    # Every worker process configures its own log handlers after the fork, so no file handle is shared
+    setup_logging()
+
+    # Every worker process installs its own signal handlers
+    install_shutdown_signal_handlers()
+
+    batch_scheduler.start()
+
+    # Build (and cache on the application) the OpenAPI schema, including the JSON schemas of the 
+    # input / output models, now instead of on the first /docs or /openapi.json request
+    data_extractor_application.openapi()
+
+
 # REGISTER THE SHUTDOWN EVENT HANDLER
 @data_extractor_application.on_event(event_type = "shutdown")
 async def shutdown():
@@ -49,6 +90,12 @@ async def shutdown():
     
     await handle_shutdown_event()
 
+    await batch_scheduler.stop()
+
+    await close_openai_client()
+
+    await close_llm_cache()
+
 
 ######################### FASTAPI APPLICATION ENDPOINTS #########################
 
@@ -62,15 +109,14 @@ async def home(request: Request):
     --------
         { dict } : Welcome message
     """
-    logger.info(msg   = "Home endpoint accessed", 
-                extra = {"request_id": request.state.request_id})
+    logger.info(msg = "Home endpoint accessed")
     
     return {"message": "Welcome to the Data Extractor API !"}
 
 
 
 # ENDPOINT FOR THE DATA EXTRACTION TASK BY GPT MODEL
-@data_extractor_application.post("/extract_information_gpt", response_model=List[OutputItemGpt], response_model_exclude_none=True)
+@data_extractor_application.post("/extract_information_gpt", response_model=List[OutputItemGpt])
 async def extract_data_gpt(input_data: List[InputItemGpt], request: Request):
     """
     This endpoint processes multiple input items concurrently, extracting relevant information
@@ -88,81 +134,60 @@ async def extract_data_gpt(input_data: List[InputItemGpt], request: Request):
 
     Note:
     -----
-        - This function processes all items concurrently using asyncio.gather
-        - The results are flattened to handle both single and multiple job postings per input item
-        - Returns an empty list for any invalid input or processing errors
+        - Items are processed by the shared BatchScheduler, which batches items of concurrent 
+          requests together and adapts the batch size (up to BATCH_SIZE) to the observed latency
+        - The per-item result lists are flattened to handle multiple job postings per input item
+        - Returns an empty list for empty input; an item that fails is returned as an OutputItem 
+          carrying the error message, without affecting the other items
     """
-    request_id = request.state.request_id
+    request_id     = request.state.request_id
+    total_count    = len(input_data)
 
-    logger.info(msg   = f"Processing {len(input_data)} input items in extract_data_gpt endpoint", 
-                extra = {"request_id"    : request_id, 
-                         "batch_id"      : "N/A", 
-                         "batch_item_id" : "N/A"}
-               )
+    # Bind the request context once instead of building an `extra` dict per log call
+    request_logger = RequestLogger(logger, {"request_id"    : request_id, 
+                                            "batch_id"      : "N/A", 
+                                            "batch_item_id" : "N/A"})
+
+    request_logger.info("Processing %d input items in extract_data_gpt endpoint", total_count)
     
     
-    logger.debug(msg   = f"Raw data: {input_data}", 
-                 extra = {"request_id": request_id})
+    # Only render the (potentially huge) raw input when debug logging is actually enabled
+    if request_logger.isEnabledFor(logging.DEBUG):
+        request_logger.debug("Raw data: %s", input_data)
 
-    if (not isinstance(input_data, list)):
-        logger.warning(msg   = "Invalid input: expected a list of InputItemGpt", 
-                       extra = {"request_id": request_id})
-        return []
-  
-    if (len(input_data) == 0):
-        logger.warning(msg   = "Empty input: the list of InputItemGpt is empty", 
-                       extra = {"request_id": request_id})
+    # FastAPI has already validated input_data as a list of InputItemGpt
+    if (total_count == 0):
+        request_logger.warning("Empty input: the list of InputItemGpt is empty")
         return []
 
-    try:
-        # Define an empty list to dump all batch's processed results
-        all_processed_results = list()
+    request_logger.info("Queueing %d items for batched processing", total_count)
 
-        for batch_id, i in enumerate(range(0, len(input_data), BATCH_SIZE), start=1):
-            # Create a batch of defined size from input data 
-            batch         = input_data[i:i+BATCH_SIZE]
-            
-            logger.info(msg   = f"Processing batch {batch_id} with {len(batch)} items", 
-                        extra = {"request_id"    : request_id, 
-                                 "batch_id"      : batch_id, 
-                                 "batch_item_id" : "N/A"
-                                }
-                       )
-
-            # Create a list of tasks, one for each input item in the batch
-            tasks         = [process_item_gpt(item          = input_item, 
-                                              index         = idx+i, 
-                                              total_count   = len(input_data),
-                                              batch_id      = batch_id,
-                                              batch_item_id = idx+1,
-                                              request_id    = request.state.request_id,
-                                             )
-                             for idx, input_item in enumerate(batch)]
+    # Bind the request-level arguments once, then hand every input item over to the shared batch scheduler
+    process_items     = functools.partial(process_items_gpt, request_id, total_count)
+    submit            = batch_scheduler.submit
+    futures           = [submit(process_items, input_item, index) for index, input_item in enumerate(input_data)]
+
+    batch_results     = await asyncio.gather(*futures, return_exceptions = True)
+
+    for index, result in enumerate(batch_results):
+        if isinstance(result, BaseException):
+            # A failing item only produces its own error item, the rest of the request is kept
+            request_logger.error("An error occurred while processing item %d: %r", index + 1, result)
             
-            # Execute batch tasks concurrently
-            batch_results = await asyncio.gather(*tasks)
-           
-            # Append batch's results in a list for further processing
-            all_processed_results.extend(batch_results)
-
-        # Flatten the results, handling both single items and lists
-        flattened_results = [item for sublist in all_processed_results for item in (sublist if isinstance(sublist, list) else [sublist])]
-        
-        logger.info(msg   = f"Successfully processed {len(flattened_results)} items", 
-                    extra = {"request_id"    : request_id, 
-                             "batch_id"      : "All"}
-                   )
-        
-        return flattened_results
+            batch_results[index] = [OutputItemGpt.build_trusted(**input_data[index].model_dump(), 
+                                                                error = f"ProcessItemError: Got error while processing item: {repr(result)}")]
+
+    # Every item yields a list of OutputItemGpt, flatten them in input order
+    flattened_results = list(chain.from_iterable(batch_results))
     
-    except Exception as ErrorGpt:
-        # Return an empty list in case of any processing error
-        logger.error(msg      = f"An error occurred while processing the input data: {repr(ErrorGpt)}", 
-                     extra    = {"request_id"    : request_id, 
-                                 "batch_id"      : "N/A", 
-                                 "batch_item_id" : "N/A"}, 
-                     exc_info = True)
-        return []  
+    request_logger.info("Successfully processed %d items", len(flattened_results), 
+                        extra = {"batch_id": "All"})
+    
+    # The output items are already validated, serialize them straight to JSON bytes in a single 
+    # pydantic-core pass and skip FastAPI's response validation
+    return Response(content    = OUTPUT_ITEMS_ADAPTER.dump_json(flattened_results, 
+                                                                exclude_none = True), 
+                    media_type = "application/json")
 
 
 
@@ -170,22 +195,12 @@ async def extract_data_gpt(input_data: List[InputItemGpt], request: Request):
 
 # RUN THE SERVER
 if __name__ == '__main__':
-    # Configure the Uvicorn server with application settings
-    config = uvicorn.Config(app     = data_extractor_application, 
-                            host    = APPLICATION_HOST, 
-                            port    = APPLICATION_PORT,
-                            workers = WORKERS
-                           )
-    
-    # Set the configurations of Uvicorn server
-    server = uvicorn.Server(config = config)
-
-    # Register signal handlers for graceful shutdown
-    signal.signal(signalnum = signal.SIGINT, 
-                  handler   = handle_shutdown_signal)
-    
-    signal.signal(signalnum = signal.SIGTERM, 
-                  handler   = handle_shutdown_signal)
-
-    # Start the server
-    server.run()
\ No newline at end of file
+    # Uvicorn needs the application as an import string to spawn multiple worker processes; "auto" picks 
+    # uvloop and httptools when they are installed and falls back to asyncio / h11 otherwise (e.g. on Windows)
+    uvicorn.run(app     = "data_extractor_api:data_extractor_application", 
+                host    = APPLICATION_HOST, 
+                port    = APPLICATION_PORT,
+                workers = WORKERS,
+                loop    = "auto",
+                http    = "auto",
+               )
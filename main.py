@@ -1,31 +1,43 @@
 # DEPENDENCIES
 import os
-import json
+import math
+import ijson
+import orjson
 import asyncio
+import functools
+import logging
 import argparse
-import warnings
 from typing import Any
 from typing import List
 from typing import Dict
+from typing import Tuple
+from typing import Callable
+from typing import Awaitable
 from pathlib import Path
+from itertools import chain
 from datetime import datetime
 from src.logging_config import setup_logging
+from pydantic import ValidationError
 from src.pydantic_input_classes import InputItemGpt
+from src.pydantic_input_classes import INPUT_ITEMS_ADAPTER
 from src.pydantic_output_classes import OutputItemGpt
-from src.processing_functions import process_item_gpt
+from src.pydantic_output_classes import OUTPUT_ITEMS_ADAPTER
+from src.processing_functions import process_items_gpt
+from src.llm_cache import close_llm_cache
+from src.model_config import OPENAI_MODEL_NAME
+from src.model_config import POSTS_PER_REQUEST
+from src.gpt_client_creator import close_openai_client
 
 
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
-
-# CONFIGURE THE LOGGING
-logger = setup_logging()
+# LOGGER FOR THIS MODULE, THE HANDLERS ARE CONFIGURED IN main()
+logger = logging.getLogger(__name__)
 
 # DEFAULT CONFIGURATION
 DEFAULT_INPUT_FILE = "data/sample_data.json"
 DEFAULT_OUTPUT_DIR = "results"
 DEFAULT_BATCH_SIZE = 5
 REQUEST_ID         = "cli_processing"
+VALIDATION_CHUNK   = 1000
 
 
 class LinkedInJobExtractorCLI:
@@ -34,15 +46,19 @@ class LinkedInJobExtractorCLI:
     for encapsulating the entire extraction workflow and provides a clean interface 
     for batch processing LinkedIn posts
     """
-    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE):
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, use_batch_api: bool = False):
         """
         Initialize the CLI processor
         
         Arguments:
         ----------
-            batch_size { int } : Number of items to process concurrently
+            batch_size    { int }  : Number of items to process concurrently
+
+            use_batch_api { bool } : Process all items as one OpenAI Batch API job (half the cost, 
+                                     results within BATCH_COMPLETION_WINDOW)
         """
         self.batch_size      = batch_size
+        self.use_batch_api   = use_batch_api
         self.processed_count = 0
         self.success_count   = 0
         self.error_count     = 0
@@ -74,27 +90,39 @@ class LinkedInJobExtractorCLI:
                 
             logger.info(f"Loading input data from: {input_file}")
             
-            with open(input_path, 'r', encoding = 'utf-8') as file:
-                raw_data = json.load(file)
-                
-            if not isinstance(raw_data, list):
-                raise ValueError("Input data must be a JSON array")
-                
-            # Validate and convert to Pydantic models
-            input_items = list()
+            # Stream the top-level array item by item instead of materializing the whole document
+            with open(input_path, 'rb') as file:
+                first_character = file.read(1)
 
-            for idx, item in enumerate(raw_data):
-                try:
-                    validated_item = InputItemGpt(**item)
-                    input_items.append(validated_item)
-                
-                except Exception as validation_error:
-                    logger.warning(f"Skipping invalid item at index {idx}: {validation_error}")
+                while first_character.isspace():
+                    first_character = file.read(1)
+
+                if (first_character != b'['):
+                    raise ValueError("Input data must be a JSON array")
+
+                file.seek(0)
                     
-            logger.info(f"Successfully loaded {len(input_items)} valid items from {len(raw_data)} total items")
+                # Validate and convert to Pydantic models in chunks as the items are parsed
+                input_items = list()
+                total_items = 0
+                raw_chunk   = list()
+
+                for item in ijson.items(file, 'item', use_float = True):
+                    raw_chunk.append(item)
+
+                    if (len(raw_chunk) == VALIDATION_CHUNK):
+                        input_items.extend(self.validate_chunk(raw_chunk, total_items))
+                        total_items += len(raw_chunk)
+                        raw_chunk    = list()
+
+                if raw_chunk:
+                    input_items.extend(self.validate_chunk(raw_chunk, total_items))
+                    total_items += len(raw_chunk)
+                    
+            logger.info(f"Successfully loaded {len(input_items)} valid items from {total_items} total items")
             return input_items
             
-        except json.JSONDecodeError as json_error:
+        except ijson.JSONError as json_error:
             raise ValueError(f"Invalid JSON format in {input_file}: {json_error}")
         
         except Exception as load_error:
@@ -102,85 +130,110 @@ class LinkedInJobExtractorCLI:
             raise
             
 
-    async def process_batch(self, batch: List[InputItemGpt], batch_id: int, total_items: int) -> List[Dict[str, Any]]:
+    def validate_chunk(self, raw_chunk: List[Any], offset: int) -> List[InputItemGpt]:
         """
-        Process a single batch of input items concurrently
+        Validate a chunk of raw input items, skipping the invalid ones
         
         Arguments:
         ----------
-            batch       { List[InputItemGpt] } : Items to process in this batch
+            raw_chunk { List[Any] } : Raw items as parsed from the input file
 
-            batch_id            { int }        : Batch identifier for logging
-            
-            total_items         { int }        : Total number of items being processed
+            offset       { int }    : Index of the first item of the chunk in the input file
             
         Returns:
         --------
-                { List[Dict[str, Any]] }        : Processed results as dictionaries
+            { List[InputItemGpt] }  : Validated input items
         """
-        logger.info(f"Processing batch {batch_id} with {len(batch)} items")
+        # The whole chunk is validated in a single pydantic-core call
+        try:
+            return INPUT_ITEMS_ADAPTER.validate_python(raw_chunk)
+
+        except ValidationError:
+            # Fall back to item by item validation to find and skip the invalid items
+            input_items = list()
+
+            for idx, item in enumerate(raw_chunk, start = offset):
+                try:
+                    validated_item = InputItemGpt(**item)
+                    input_items.append(validated_item)
+                
+                except Exception as validation_error:
+                    logger.warning(f"Skipping invalid item at index {idx}: {validation_error}")
+
+            return input_items
+
+
+    async def process_chunk(self, extract_items: Callable[..., Awaitable], chunk: List[Tuple[int, InputItemGpt]], total_items: int, semaphore: asyncio.Semaphore) -> List[OutputItemGpt]:
+        """
+        Process a chunk of input items with a single GPT request as soon as a slot in the 
+        concurrency window is free
         
-        # Create tasks for concurrent processing
-        tasks = list()
-
-        for idx, item in enumerate(batch):
-            global_idx    = (batch_id - 1) * self.batch_size + idx
-            task          = process_item_gpt(item          = item,
-                                             index         = global_idx,
-                                             total_count   = total_items,
-                                             batch_id      = batch_id,
-                                             batch_item_id = idx + 1,
-                                             request_id    = REQUEST_ID,
-                                            )
-            tasks.append(task)
+        Arguments:
+        ----------
+            extract_items     { Callable }    : process_items_gpt with REQUEST_ID and total_items bound
+
+            chunk               { list }      : (index, item) pairs of the items to process together
             
-        # Execute all tasks concurrently
-        batch_results     = await asyncio.gather(*tasks, return_exceptions = True)
-        
+            total_items         { int }       : Total number of items being processed
+
+            semaphore   { asyncio.Semaphore } : Semaphore bounding the number of in-flight chunks
+            
+        Returns:
+        --------
+                { List[OutputItemGpt] }       : Processed results as output items
+        """
+        first_index   = chunk[0][0]
+        batch_id      = (first_index // self.batch_size) + 1
+        entries       = [(item, index, (index % self.batch_size) + 1) for index, item in chunk]
+
+        async with semaphore:
+            try:
+                results = await extract_items(entries, batch_id)
+
+            except Exception as chunk_error:
+                results = [chunk_error] * len(entries)
+
         # Process results and handle exceptions
         processed_results = list()
 
-        for idx, result in enumerate(batch_results):
+        for (item, _, batch_item_id), result in zip(entries, results):
             if isinstance(result, Exception):
-                logger.error(f"Error processing item {idx} in batch {batch_id}: {result}")
+                logger.error(f"Error processing item {batch_item_id} in batch {batch_id}: {result}")
                 
                 self.error_count += 1
                 
                 # Create error response
-                error_item        = batch[idx].dict()
-                
-                error_item.update({"classification" : "Error",
-                                   "error"          : f"ProcessingError: {str(result)}"
-                                 })
+                error_item        = OutputItemGpt.build_trusted(**item.model_dump(),
+                                                                classification = "Error",
+                                                                error          = f"ProcessingError: {str(result)}",
+                                                               )
 
                 processed_results.append(error_item)
 
             else:
-                # Handle both single items and lists of items
-                if isinstance(result, list):
-                    for item in result:
-                        if isinstance(item, OutputItemGpt):
-                            processed_results.append(item.dict(exclude_none = True))
-                        
-                        else:
-                            processed_results.append(item)
-                        
-                        self.success_count += 1
-                else:
-                    if isinstance(result, OutputItemGpt):
-                        processed_results.append(result.dict(exclude_none=True))
-                    
-                    else:
-                        processed_results.append(result)
-                    
-                    self.success_count += 1
+                # Serialization of the output items happens once at the end
+                processed_results.extend(result)
+
+                self.success_count += len(result)
+
+            self.processed_count += 1
+            
+            # Progress update, once per completed batch worth of items
+            if ((self.processed_count % self.batch_size == 0) or (self.processed_count == total_items)):
+                progress = (self.processed_count / total_items) * 100
+
+                logger.info("Progress: %.1f%% (%d/%d items)", progress, self.processed_count, total_items)
                     
         return processed_results
         
 
     async def process_all_items(self, input_items: List[InputItemGpt]) -> List[Dict[str, Any]]:
         """
-        Process all input items in batches with progress tracking
+        Process all input items through a sliding window of concurrent requests with progress 
+        tracking, consecutive items are grouped into chunks of up to POSTS_PER_REQUEST items and 
+        a new chunk starts as soon as any in-flight chunk finishes
+
+        With the Batch API all items form a single chunk, submitted as one offline batch job
         
         Arguments:
         ----------
@@ -191,30 +244,26 @@ class LinkedInJobExtractorCLI:
                { List[Dict[str, Any]] }        : All processed results
         """
         total_items = len(input_items)
-        all_results = list()
+        chunk_size  = total_items if self.use_batch_api else min(POSTS_PER_REQUEST, self.batch_size)
+        semaphore   = asyncio.Semaphore(max(1, math.ceil(self.batch_size / chunk_size)))
         
-        logger.info(f"Starting processing of {total_items} items in batches of {self.batch_size}")
+        logger.info("Starting processing of %d items with %d items in flight", total_items, self.batch_size)
         
-        # Process items in batches
-        for batch_id, i in enumerate(range(0, total_items, self.batch_size), start=1):
-            batch = input_items[i:i + self.batch_size]
-            
-            try:
-                batch_results = await self.process_batch(batch, batch_id, total_items)
-                all_results.extend(batch_results)
-
-                self.processed_count += len(batch)
-                
-                # Progress update
-                progress              = (self.processed_count / total_items) * 100
-
-                logger.info(f"Progress: {progress:.1f}% ({self.processed_count}/{total_items} items)")
-                
-            except Exception as batch_error:
-                logger.error(f"Error processing batch {batch_id}: {batch_error}")
-                self.error_count += len(batch)
-                
-        return all_results
+        # The request-level arguments are bound once for all items, consecutive items share one GPT request
+        extract_items = functools.partial(process_items_gpt, REQUEST_ID, total_items, use_batch_api = self.use_batch_api)
+        process_chunk = self.process_chunk
+        indexed_items = list(enumerate(input_items))
+        tasks         = [process_chunk(extract_items, indexed_items[start:start + chunk_size], total_items, semaphore) 
+                         for start in range(0, total_items, chunk_size)]
+        
+        # Results come back in input order as one list per chunk, flatten them
+        all_results = list(chain.from_iterable(await asyncio.gather(*tasks)))
+        
+        # Serialize all output items in a single pydantic-core pass; python mode keeps the empty strings
+        # of the output file as they are (the JSON mode serializer of the API writes them as null)
+        return OUTPUT_ITEMS_ADAPTER.dump_python(all_results, 
+                                                exclude_none = True,
+                                               )
         
 
     async def save_results(self, results: List[Dict[str, Any]], output_file: str) -> None:
@@ -240,18 +289,16 @@ class LinkedInJobExtractorCLI:
                                          "successful_extractions"   : self.success_count,
                                          "errors"                   : self.error_count,
                                          "batch_size"               : self.batch_size,
-                                         "prompt_engineering_model" : "gpt-3.5-turbo-instruct",
-                                         "processing_type"          : "CLI Batch Processing",
+                                         "prompt_engineering_model" : OPENAI_MODEL_NAME,
+                                         "processing_type"          : "CLI Batch API Processing" if self.use_batch_api else "CLI Batch Processing",
                                         },
                            "results"  : results,
                           }
             
-            # Save to file
-            with open(output_path, 'w', encoding='utf-8') as file:
-                json.dump(obj          = output_data, 
-                          fp           = file, 
-                          indent       = 4, 
-                          ensure_ascii = False)
+            # Save to file, orjson writes UTF-8 encoded bytes directly
+            with open(output_path, 'wb') as file:
+                file.write(orjson.dumps(output_data, 
+                                        option = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
                 
             logger.info(f"Results saved to: {output_file}")
             logger.info(f"Total items processed: {self.processed_count}")
@@ -312,6 +359,7 @@ def create_argument_parser() -> argparse.ArgumentParser:
                                                             python main.py --input data/custom_data.json
                                                             python main.py --output results/my_output.json --batch-size 10
                                                             python main.py --input data/test.json --output results/test_output.json --batch-size 3
+                                                            python main.py --input data/large_data.json --batch-api
                                                        """,
                                      formatter_class = argparse.RawDescriptionHelpFormatter
                                     )
@@ -336,6 +384,11 @@ def create_argument_parser() -> argparse.ArgumentParser:
                         help    = f'Number of items to process concurrently (default: {DEFAULT_BATCH_SIZE})',
                        )
     
+    parser.add_argument('--batch-api', 
+                        action = 'store_true',
+                        help   = 'Process all items as one OpenAI Batch API job: half the cost, results within 24 hours',
+                       )
+    
     parser.add_argument('--verbose', 
                         '-v',
                         action = 'store_true',
@@ -372,9 +425,8 @@ async def main():
     parser = create_argument_parser()
     args   = parser.parse_args()
     
-    # Configure logging level
-    if args.verbose:
-        logger.setLevel("DEBUG")
+    # Configure logging, --verbose sets up the handlers at DEBUG level
+    setup_logging(level = logging.DEBUG if args.verbose else logging.INFO)
         
     # Generate output filename if not provided
     output_file = args.output or generate_output_filename(args.input)
@@ -386,7 +438,9 @@ async def main():
         
     try:
         # Create and run CLI processor
-        cli_processor = LinkedInJobExtractorCLI(batch_size = args.batch_size)
+        cli_processor = LinkedInJobExtractorCLI(batch_size    = args.batch_size,
+                                                use_batch_api = args.batch_api,
+                                               )
         
         await cli_processor.run(args.input, 
                                 output_file,
@@ -404,10 +458,23 @@ async def main():
     except Exception as unexpected_error:
         logger.error(f"Unexpected error: {unexpected_error}")
 
+    finally:
+        # Release the shared OpenAI client connection pool and the response cache
+        await close_openai_client()
+        await close_llm_cache()
+
 
 if __name__ == "__main__":
     print("LinkedIn Job Data Extractor - Prompt Engineering CLI")
     print("=" * 60)
     
-    # Run the async main function
-    asyncio.run(main())
\ No newline at end of file
+    # Install uvloop as the event loop policy where it is available (it does not support Windows), 
+    # otherwise stay on the default asyncio loop, then run the async main function
+    try:
+        import uvloop
+        uvloop.install()
+
+    except ImportError:
+        pass
+
+    asyncio.run(main())
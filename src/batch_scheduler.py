@@ -0,0 +1,269 @@
+# DEPENDENCIES
+import asyncio
+import logging
+import itertools
+import statistics
+from typing import Callable
+from typing import Awaitable
+from collections import deque
+from .logging_config import RequestLogger
+from .pydantic_input_classes import InputItemGpt
+
+
+# CONFIGURE THE LOGGING, ALL RECORDS OF THE SCHEDULER SHARE ITS REQUEST ID
+logger = RequestLogger(logging.getLogger(__name__), {"request_id": "batch_scheduler"})
+
+
+# HOW MUCH FASTER THAN THE THROUGHPUT THE P95 LATENCY MAY GROW BEFORE THE BATCH SIZE IS REDUCED
+SHRINK_THRESHOLD = 1.25
+
+
+class BatchScheduler:
+    """
+    Dynamic batch scheduler for GPT data extraction
+
+    Input items submitted by all incoming requests are collected in a shared queue and 
+    dispatched in batches. A batch is dispatched as soon as it holds the current batch
+    size worth of items or when the maximum wait time since its first item has elapsed, 
+    whichever comes first. 
+    
+    The batch size adapts to the observed load, one item at a time: it shrinks when the p95 
+    batch latency grows faster than the throughput by more than SHRINK_THRESHOLD, and grows 
+    back while the throughput keeps up with the latency. The tolerance band in between keeps 
+    the size stable against noise
+
+    Within a batch, consecutive items of the same request are processed in chunks of up 
+    to posts_per_request items, so that each chunk costs a single GPT request
+    """
+    def __init__(self, max_batch_size: int, max_wait_ms: float, posts_per_request: int = 1, latency_window: int = 10):
+        """
+        Initialize the BatchScheduler
+
+        Arguments:
+        ----------
+            max_batch_size       { int }   : Upper bound of the number of items in a batch
+
+            max_wait_ms          { float } : Maximum time a batch waits for more items after its first item
+            
+            posts_per_request    { int }   : Maximum number of items of one request processed together
+
+            latency_window       { int }   : Number of batches observed before re-tuning the batch size
+        """
+        self.max_batch_size    = max_batch_size
+        self.batch_size        = max_batch_size
+        self.max_wait          = max_wait_ms / 1000
+        self.posts_per_request = max(1, posts_per_request)
+        self.queue             = asyncio.Queue()
+        self.recent_batches    = deque(maxlen = latency_window)
+        self.baseline          = None
+        self.batch_counter     = 0
+        self.consumer          = None
+        self.collecting        = list()
+        self.dispatch_tasks    = set()
+
+
+    def start(self) -> None:
+        """
+        Start the background consumer, if it is not running already
+        """
+        if ((self.consumer is None) or self.consumer.done()):
+            self.consumer = asyncio.create_task(self._consume())
+
+            logger.info("BatchScheduler started with a maximum batch size of %d", self.max_batch_size)
+
+
+    async def stop(self) -> None:
+        """
+        Stop the background consumer, fail the items it will no longer dispatch and wait for the 
+        in-flight batches to finish
+        """
+        if self.consumer is not None:
+            self.consumer.cancel()
+
+            await asyncio.gather(self.consumer, return_exceptions = True)
+            
+            self.consumer = None
+
+        # The batch being collected and the items still queued would leave their requesters waiting forever
+        abandoned       = self.collecting
+        self.collecting = list()
+
+        while (not self.queue.empty()):
+            abandoned.append(self.queue.get_nowait())
+
+        for _, _, _, future in abandoned:
+            if (not future.done()):
+                future.set_exception(RuntimeError("BatchScheduler stopped before the item was processed"))
+
+        await asyncio.gather(*self.dispatch_tasks, return_exceptions = True)
+
+        logger.info("BatchScheduler stopped")
+
+
+    def submit(self, process_items: Callable[..., Awaitable], item: InputItemGpt, index: int) -> asyncio.Future:
+        """
+        Queue a single input item for batched processing
+
+        Arguments:
+        ----------
+            process_items { Callable } : process_items_gpt with the request-level arguments (request_id, 
+                                         total_count) already bound by functools.partial; items are 
+                                         only processed together with items sharing the same callable
+
+            item      { InputItemGpt } : The input item to process
+            
+            index          { int }     : The index of the input item in total input array
+
+        Returns:
+        --------
+            { asyncio.Future }         : Future resolved with the output items of the input item
+        """
+        self.start()
+
+        future = asyncio.get_running_loop().create_future()
+
+        self.queue.put_nowait((process_items, item, index, future))
+
+        return future
+
+
+    async def _consume(self) -> None:
+        """
+        Background loop collecting queued items into batches and dispatching them
+        """
+        # Batches are dispatched right away, the number of GPT calls in flight is bounded per call by
+        # the shared GPT request semaphore, so a slow batch never holds back the items of other requests
+        while True:
+            batch         = await self._collect_batch()
+            dispatch_task = asyncio.create_task(self._dispatch(batch))
+
+            self.dispatch_tasks.add(dispatch_task)
+            dispatch_task.add_done_callback(self.dispatch_tasks.discard)
+
+
+    async def _collect_batch(self) -> list:
+        """
+        Collect up to batch_size queued items, waiting at most max_wait after the first one
+        """
+        loop     = asyncio.get_running_loop()
+
+        # The batch is kept on the scheduler until it is dispatched, so that stop() can fail its items
+        batch    = self.collecting
+        batch.append(await self.queue.get())
+        deadline = loop.time() + self.max_wait
+
+        while (len(batch) < self.batch_size):
+            if (not self.queue.empty()):
+                batch.append(self.queue.get_nowait())
+                continue
+
+            remaining = deadline - loop.time()
+
+            if (remaining <= 0):
+                break
+
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout = remaining))
+            
+            except asyncio.TimeoutError:
+                break
+
+        self.collecting = list()
+
+        return batch
+
+
+    async def _dispatch(self, batch: list) -> None:
+        """
+        Process a batch of queued items concurrently and resolve their futures
+        """
+        loop                = asyncio.get_running_loop()
+        self.batch_counter += 1
+        batch_id            = self.batch_counter
+
+        logger.info("Processing batch %d with %d items", batch_id, len(batch), 
+                    extra = {"batch_id": batch_id})
+
+        started = loop.time()
+
+        # The task group cancels every chunk of the batch together if the dispatch itself is cancelled
+        run_chunk = self._run_chunk
+
+        # The requester may have gone away in the meantime
+        pending   = [(position + 1, entry) for position, entry in enumerate(batch) if not entry[3].done()]
+
+        async with asyncio.TaskGroup() as task_group:
+            for process_items, request_entries in itertools.groupby(pending, key = lambda pending_entry: pending_entry[1][0]):
+                request_entries = iter(request_entries)
+
+                while (chunk := list(itertools.islice(request_entries, self.posts_per_request))):
+                    task_group.create_task(run_chunk(process_items, chunk, batch_id))
+
+        self._adapt_batch_size(batch_length = len(batch), 
+                               started      = started,
+                               finished     = loop.time())
+
+
+    async def _run_chunk(self, process_items: Callable[..., Awaitable], chunk: list, batch_id: int) -> None:
+        """
+        Process a chunk of items of the same request and resolve their futures as soon as it is done;
+        every GPT call of the chunk is bounded by its own COMPLETION_TIMEOUT, so a slow batched 
+        request still leaves the per-post fallback its full budget
+        """
+        futures = [future for _, (_, _, _, future) in chunk]
+
+        try:
+            results = await process_items([(item, index, batch_item_id) for batch_item_id, (_, item, index, _) in chunk], batch_id)
+
+        except Exception as chunk_error:
+            for future in futures:
+                if (not future.done()):
+                    future.set_exception(chunk_error)
+
+        else:
+            for future, result in zip(futures, results):
+                if (not future.done()):
+                    future.set_result(result)
+
+        finally:
+            # Only left pending when the chunk itself got cancelled
+            for future in futures:
+                if (not future.done()):
+                    future.cancel()
+
+
+    def _adapt_batch_size(self, batch_length: int, started: float, finished: float) -> None:
+        """
+        Re-tune the batch size once every latency_window batches, comparing the trend of the p95 
+        batch latency with the trend of the throughput (items per second of wall-clock time) 
+        since the previous window
+        """
+        self.recent_batches.append((started, finished, batch_length))
+
+        if (len(self.recent_batches) < self.recent_batches.maxlen):
+            return
+
+        latencies   = [batch_finished - batch_started for batch_started, batch_finished, _ in self.recent_batches]
+        p95_latency = max(statistics.quantiles(latencies, n = 20, method = "inclusive")[-1], 1e-6)
+        window      = max(max(batch_finished for _, batch_finished, _ in self.recent_batches) - 
+                          min(batch_started for batch_started, _, _ in self.recent_batches), 1e-6)
+        throughput  = sum(length for _, _, length in self.recent_batches) / window
+
+        if self.baseline is not None:
+            baseline_p95, baseline_throughput = self.baseline
+
+            latency_trend    = p95_latency / baseline_p95
+            throughput_trend = throughput / baseline_throughput
+
+            # The latency outgrows the throughput by more than the tolerance: larger batches no longer pay off
+            if (latency_trend > (throughput_trend * SHRINK_THRESHOLD)):
+                self.batch_size = max(1, self.batch_size - 1)
+
+            # The throughput keeps up with the latency: larger batches amortize the per-request overhead
+            elif (latency_trend <= throughput_trend):
+                self.batch_size = min(self.max_batch_size, self.batch_size + 1)
+
+            logger.debug("Batch size tuned to %d (p95 latency: %.2fs, throughput: %.2f items/s)", self.batch_size, p95_latency, throughput)
+
+        self.baseline = (p95_latency, throughput)
+        self.recent_batches.clear()
@@ -0,0 +1,300 @@
+# DEPENDENCIES
+import httpx
+import orjson
+import asyncio
+import logging
+from .model_config import BATCH_POLL_INTERVAL
+from .model_config import BATCH_COMPLETION_WINDOW
+from .model_config import BATCH_MAX_POLL_INTERVAL
+from .gpt_prompt_creator import create_prompt
+from .gpt_prompt_creator import SYSTEM_PROMPT
+from .llm_cache import build_cache_key
+from .llm_cache import get_cached_response
+from .llm_cache import set_cached_response
+from .gpt_client_creator import get_openai_client
+from .gpt_data_extractor import get_post_fields
+from .gpt_data_extractor import RETRYABLE_STATUS_CODES
+from .gpt_data_extractor import extract_information
+from .gpt_data_extractor import build_completion_payload
+from .gpt_data_extractor import finalize_extracted_info
+
+
+# LOGGING
+logger = logging.getLogger(__name__)
+
+
+# STATUSES OF A BATCH WHICH WILL NOT CHANGE ANY MORE
+FINAL_BATCH_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+
+# HELPER : UPLOAD THE REQUESTS OF A BATCH AND START IT
+async def submit_batch(openai_client_instance: httpx.AsyncClient, batch_requests: dict) -> str:
+    """
+    Upload the chat completion requests as a JSONL file and create a batch processing them
+
+    Arguments:
+    ----------
+        openai_client_instance { httpx.AsyncClient } : The shared OpenAI API client
+
+        batch_requests               { dict }        : Request body of every chat completion, by custom_id
+
+    Returns:
+    --------
+                                     { str }         : Id of the created batch
+    """
+    batch_input     = b"".join(orjson.dumps({"custom_id" : custom_id,
+                                             "method"    : "POST",
+                                             "url"       : "/v1/chat/completions",
+                                             "body"      : completion_payload,
+                                            }) + b"\n" for custom_id, completion_payload in batch_requests.items())
+
+    # The input file can be large, so the transfer is not bound by the default request timeout
+    upload_response = await openai_client_instance.post(url     = "/files",
+                                                        data    = {"purpose": "batch"},
+                                                        files   = {"file": ("batch_input.jsonl", batch_input, "application/jsonl")},
+                                                        timeout = None)
+    upload_response.raise_for_status()
+
+    batch_response  = await openai_client_instance.post(url  = "/batches",
+                                                        json = {"input_file_id"     : orjson.loads(upload_response.content)["id"],
+                                                                "endpoint"          : "/v1/chat/completions",
+                                                                "completion_window" : BATCH_COMPLETION_WINDOW,
+                                                               })
+    batch_response.raise_for_status()
+
+    return orjson.loads(batch_response.content)["id"]
+
+
+# HELPER : WAIT FOR A BATCH TO FINISH
+async def wait_for_batch(openai_client_instance: httpx.AsyncClient, batch_id: str) -> dict:
+    """
+    Poll a batch with exponential backoff until it reaches a final status
+
+    Arguments:
+    ----------
+        openai_client_instance { httpx.AsyncClient } : The shared OpenAI API client
+
+        batch_id                     { str }         : Id of the batch to wait for
+
+    Returns:
+    --------
+                                     { dict }        : The batch object in its final status
+    """
+    poll_interval = BATCH_POLL_INTERVAL
+
+    while True:
+        await asyncio.sleep(delay = poll_interval)
+
+        poll_interval = min(BATCH_MAX_POLL_INTERVAL, poll_interval * 2)
+
+        try:
+            batch_response = await openai_client_instance.get(url = f"/batches/{batch_id}")
+            batch_response.raise_for_status()
+
+        except (httpx.HTTPStatusError, httpx.TransportError) as PollError:
+            if (isinstance(PollError, httpx.HTTPStatusError) and (PollError.response.status_code not in RETRYABLE_STATUS_CODES)):
+                raise
+
+            # A batch runs for hours, a single failed poll (transient error or rate limit) is not a reason to give it up
+            logger.warning(msg   = f"BatchPollError: Could not check batch {batch_id}, got: {repr(PollError)}",
+                           extra = {"request_id": "batch_api"})
+            continue
+
+        batch = orjson.loads(batch_response.content)
+
+        logger.info(msg   = f"Batch {batch_id} is {batch['status']}: {batch.get('request_counts')}",
+                    extra = {"request_id": "batch_api"})
+
+        if (batch["status"] in FINAL_BATCH_STATUSES):
+            return batch
+
+
+# HELPER : CANCEL A BATCH WHOSE RESULTS WILL NOT BE USED
+async def cancel_batch(openai_client_instance: httpx.AsyncClient, batch_id: str) -> None:
+    """
+    Cancel a batch which is still running, so that it is not billed on top of the synchronous
+    fallback requests
+
+    Arguments:
+    ----------
+        openai_client_instance { httpx.AsyncClient } : The shared OpenAI API client
+
+        batch_id                     { str }         : Id of the batch to cancel
+    """
+    try:
+        cancel_response = await openai_client_instance.post(url = f"/batches/{batch_id}/cancel")
+        cancel_response.raise_for_status()
+
+        logger.info(msg   = f"Cancelled batch {batch_id}",
+                    extra = {"request_id": "batch_api"})
+
+    except (httpx.HTTPStatusError, httpx.TransportError) as CancelError:
+        logger.warning(msg   = f"BatchCancelError: Could not cancel batch {batch_id}, got: {repr(CancelError)}",
+                       extra = {"request_id": "batch_api"})
+
+
+# HELPER : PARSE THE OUTPUT FILE OF A FINISHED BATCH
+def parse_batch_output(batch_output: bytes) -> dict:
+    """
+    Collect the response text of every successful request from the JSONL output file of a batch
+
+    Arguments:
+    ----------
+        batch_output { bytes } : Content of the output file
+
+    Returns:
+    --------
+               { dict }        : Text content of the response message, by custom_id
+    """
+    response_texts = dict()
+
+    for line in batch_output.splitlines():
+        if (not line.strip()):
+            continue
+
+        batch_result = orjson.loads(line)
+        response     = batch_result.get("response") or {}
+
+        if (response.get("status_code") == 200):
+            response_texts[batch_result["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+
+    return response_texts
+
+
+# HELPER : DOWNLOAD THE RESULTS OF A FINISHED BATCH
+async def download_batch_results(openai_client_instance: httpx.AsyncClient, output_file_id: str) -> dict:
+    """
+    Download the output file of a finished batch and collect the response text of every
+    successful request
+
+    Arguments:
+    ----------
+        openai_client_instance { httpx.AsyncClient } : The shared OpenAI API client
+
+        output_file_id               { str }         : Id of the output file of the batch
+
+    Returns:
+    --------
+                                     { dict }        : Text content of the response message, by custom_id
+    """
+    output_response = await openai_client_instance.get(url     = f"/files/{output_file_id}/content",
+                                                       timeout = None)
+    output_response.raise_for_status()
+
+    # The output file holds a response per post, parse it off the event loop
+    return await asyncio.to_thread(parse_batch_output, output_response.content)
+
+
+# EXTRACT INFORMATION FROM LINKEDIN POSTS USING THE OPENAI BATCH API
+async def extract_information_via_batch_api(linkedin_posts: list) -> list:
+    """
+    Process the input LinkedIn posts of an offline job through the OpenAI Batch API, which is
+    billed at half the price of synchronous requests and has its own, much higher, rate limits:
+    1. Uploads one chat completion request per post which is not cached yet
+    2. Waits until the batch has finished (within BATCH_COMPLETION_WINDOW)
+    3. Routes the responses back to the posts by their custom_id
+
+    Arguments:
+    ----------
+        linkedin_posts { list } : The LinkedIn posts scraped, each in a python dictionary format
+                                  (JSON) as expected by extract_information
+
+    Returns:
+    --------
+              { list }          : The results of extract_information for every post, in the
+                                  same order as the posts
+
+    Note:
+    -----
+        - The custom_id of a request is the cache key of its post, so identical posts are sent
+          only once and the responses are routed back deterministically
+
+        - Posts without a usable response, or all posts if the batch itself fails, fall back to
+          the synchronous extract_information
+    """
+    post_fields  = [get_post_fields(linkedin_post = linkedin_post) for linkedin_post in linkedin_posts]
+    cache_keys   = [build_cache_key(*fields) for fields in post_fields]
+
+    # Posts already in the cache are not sent to GPT again
+    cached_infos = await asyncio.gather(*(get_cached_response(cache_key = cache_key) for cache_key in cache_keys))
+    results      = [None if (cached_info is None) else finalize_extracted_info(extracted_info = cached_info, poster_name = fields[0])
+                    for fields, cached_info in zip(post_fields, cached_infos)]
+
+    batch_requests = {cache_key : build_completion_payload(system_prompt = SYSTEM_PROMPT,
+                                                           user_prompt   = create_prompt(*fields))
+                      for cache_key, fields, result in zip(cache_keys, post_fields, results) if (result is None)}
+
+    if batch_requests:
+        batch_id = None
+        batch    = None
+
+        try:
+            openai_client_instance = await get_openai_client()
+
+            if (isinstance(openai_client_instance, str)):
+                raise RuntimeError(openai_client_instance)
+
+            batch_id               = await submit_batch(openai_client_instance = openai_client_instance,
+                                                        batch_requests         = batch_requests)
+
+            logger.info(msg   = f"Submitted batch {batch_id} with {len(batch_requests)} requests",
+                        extra = {"request_id": "batch_api"})
+
+            batch                  = await wait_for_batch(openai_client_instance = openai_client_instance,
+                                                          batch_id               = batch_id)
+
+            if ((batch["status"] != "completed") or (not batch.get("output_file_id"))):
+                raise RuntimeError(f"Batch {batch_id} ended as {batch['status']} without output")
+
+            response_texts         = await download_batch_results(openai_client_instance = openai_client_instance,
+                                                                  output_file_id         = batch["output_file_id"])
+
+        except Exception as BatchApiError:
+            logger.error(msg      = f"BatchApiError: Falling back to synchronous requests, got: {repr(BatchApiError)}",
+                         extra    = {"request_id": "batch_api"},
+                         exc_info = True)
+
+            response_texts         = dict()
+
+        finally:
+            # A batch which is still running would be billed on top of the synchronous requests, or for
+            # nothing at all when the job itself got cancelled (e.g. Ctrl-C), which no except above catches
+            if ((batch_id is not None) and ((batch is None) or (batch["status"] not in FINAL_BATCH_STATUSES))):
+                await cancel_batch(openai_client_instance = openai_client_instance,
+                                   batch_id               = batch_id)
+
+        cached_keys = set()
+
+        for position, (cache_key, fields) in enumerate(zip(cache_keys, post_fields)):
+            if ((results[position] is not None) or (cache_key not in response_texts)):
+                continue
+
+            try:
+                extracted_info = orjson.loads(response_texts[cache_key])
+
+            except orjson.JSONDecodeError:
+                continue
+
+            # Identical posts share the response, it is cached once
+            if (cache_key not in cached_keys):
+                await set_cached_response(cache_key     = cache_key,
+                                          response_text = response_texts[cache_key])
+
+                cached_keys.add(cache_key)
+
+            results[position] = finalize_extracted_info(extracted_info = extracted_info,
+                                                        poster_name    = fields[0])
+
+    # Posts without a usable batch response are processed synchronously
+    missing = [position for position, result in enumerate(results) if (result is None)]
+
+    if missing:
+        logger.warning(msg   = f"Processing {len(missing)} posts without a batch response synchronously",
+                       extra = {"request_id": "batch_api"})
+
+        fallback_results = await asyncio.gather(*(extract_information(linkedin_post = linkedin_posts[position]) for position in missing))
+
+        for position, result in zip(missing, fallback_results):
+            results[position] = result
+
+    return results
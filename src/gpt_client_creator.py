@@ -1,24 +1,34 @@
 # DEPENDENCIES
 import os
+import httpx
+import asyncio
 import logging
-import warnings
-from openai import AsyncOpenAI
 from .model_config import TIMEOUT
 from .model_config import MAX_RETRIES
 from .model_config import OPENAI_API_KEY
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+from .model_config import OPENAI_BASE_URL
+from .model_config import MAX_CONNECTIONS
+from .model_config import KEEPALIVE_EXPIRY
+from .model_config import MAX_KEEPALIVE_CONNECTIONS
 
 
 # LOGGING 
 logger = logging.getLogger(__name__)
 
 
+# SHARED OPENAI CLIENT, CREATED LAZILY ON FIRST USE
+_openai_client      = None
+_openai_client_lock = asyncio.Lock()
+
+
 # OPENAI CLIENT CREATOR
-async def create_openai_client() -> AsyncOpenAI:
+async def create_openai_client() -> httpx.AsyncClient:
     """
-    Creates / initializes the OpenAI client for the GPT-3.5-Turbo-Instruct model
+    Creates / initializes the HTTP client for the OpenAI REST API, authenticated for the 
+    GPT model
+
+    The GPT endpoints are POSTed to directly instead of going through the OpenAI SDK, which 
+    saves the SDK's request / response model construction on every call
 
     Errors:
     -------
@@ -28,7 +38,7 @@ async def create_openai_client() -> AsyncOpenAI:
 
     Returns:
     --------
-           { Asynchronous }      : An instance of AsyncOpenAI client
+      { httpx.AsyncClient }      : An instance of httpx.AsyncClient bound to OPENAI_BASE_URL
     """
     # VALIDATE ENVIRONMENT VARIABLES
     if (not all([OPENAI_API_KEY, MAX_RETRIES, TIMEOUT])):
@@ -41,25 +51,75 @@ async def create_openai_client() -> AsyncOpenAI:
         return error_message
     
     try:
-        # Initialize the Async OpenAI client
-        openai_client = AsyncOpenAI(api_key     = OPENAI_API_KEY,
-                                    timeout     = TIMEOUT,
-                                    max_retries = MAX_RETRIES,
-                                   )
+        # Explicitly sized HTTP/2 connection pool, concurrent GPT calls are multiplexed over it
+        openai_client = httpx.AsyncClient(base_url = OPENAI_BASE_URL,
+                                          headers  = {"Authorization" : f"Bearer {OPENAI_API_KEY}"},
+                                          limits   = httpx.Limits(max_connections           = MAX_CONNECTIONS,
+                                                                  max_keepalive_connections = MAX_KEEPALIVE_CONNECTIONS,
+                                                                  keepalive_expiry          = KEEPALIVE_EXPIRY,
+                                                                 ),
+                                          http2    = True,
+                                          timeout  = TIMEOUT,
+                                         )
         
-        logger.info(msg   = 'Successfully created AsyncOpenAI API client', 
+        logger.info(msg   = 'Successfully created OpenAI API client', 
                     extra = {"request_id": "openai_client_creation"})
         
         return openai_client
     
     except Exception as ClientCreationError:
-         exception_error_message = f"ClientCreationError: Error creating the AsyncOpenAI client: {repr(ClientCreationError)}"
+         exception_error_message = f"ClientCreationError: Error creating the OpenAI API client: {repr(ClientCreationError)}"
          
          logger.error(msg      = exception_error_message, 
                       extra    = {"request_id": "openai_client_creation"}, 
                       exc_info = True)
          
          return exception_error_message
-    
 
-    
\ No newline at end of file
+
+
+# SHARED OPENAI CLIENT ACCESSOR
+async def get_openai_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide OpenAI API client, creating it on first use so that its HTTP
+    connection pool (and keep-alive connections) is reused across all GPT calls
+
+    Returns:
+    --------
+      { httpx.AsyncClient }      : The shared OpenAI API client, or the error message returned 
+                                   by create_openai_client if the creation failed
+    """
+    global _openai_client
+
+    # Fast path without the lock once the client exists
+    if _openai_client is not None:
+        return _openai_client
+
+    # Concurrent first calls must not each create (and leak) their own client
+    async with _openai_client_lock:
+        if _openai_client is None:
+            openai_client = await create_openai_client()
+
+            # Do not cache creation errors, the next call will try again
+            if (isinstance(openai_client, str)):
+                return openai_client
+
+            _openai_client = openai_client
+
+    return _openai_client
+
+
+# SHARED OPENAI CLIENT CLEANUP
+async def close_openai_client() -> None:
+    """
+    Closes the shared OpenAI API client and its connection pool, if it has been created
+    """
+    global _openai_client
+
+    if _openai_client is not None:
+        await _openai_client.aclose()
+
+        _openai_client = None
+        
+        logger.info(msg   = 'Successfully closed the OpenAI API client', 
+                    extra = {"request_id": "openai_client_creation"})
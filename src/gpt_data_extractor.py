@@ -1,29 +1,255 @@
 # DEPENDENCIES
 import os
-import json
+import httpx
+import orjson
 import random
 import asyncio
 import logging
-import warnings
 from .model_config import SEED
+from .model_config import MAX_DELAY
 from .model_config import BASE_DELAY
 from .model_config import MAX_TOKENS
 from .model_config import MAX_RETRIES
 from .model_config import OPENAI_MODEL_NAME
 from .model_config import MODEL_TEMPERATURE
+from .model_config import COMPLETION_TIMEOUT
 from .gpt_prompt_creator import create_prompt
-from .gpt_client_creator import create_openai_client
+from .gpt_prompt_creator import SYSTEM_PROMPT
+from .gpt_prompt_creator import create_batch_prompt
+from .gpt_prompt_creator import BATCH_SYSTEM_PROMPT
+from .rate_limiter import get_gpt_request_bucket
+from .rate_limiter import get_gpt_request_semaphore
+from .llm_cache import build_cache_key
+from .llm_cache import get_cached_response
+from .llm_cache import set_cached_response
+from .gpt_client_creator import get_openai_client
 from .gpt_post_processor import post_process_extracted_info
 
 
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
-
-
 # LOGGING 
 logger = logging.getLogger(__name__)
 
 
+# HTTP STATUS CODES OF TRANSIENT OPENAI API ERRORS WHICH ARE RETRIED
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+# TRANSLATION TABLE FLATTENING LINE BREAKS AND TABS OF THE POST FIELDS IN A SINGLE PASS
+NEWLINE_TRANSLATION    = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+
+
+# HELPER : RETRY-AFTER HEADER OF A FAILED OPENAI API REQUEST
+def get_retry_after(request_error: Exception) -> float:
+    """
+    Read the Retry-After header (in seconds) of a failed OpenAI API request
+
+    Arguments:
+    ----------
+        request_error { Exception } : The error raised by the OpenAI API request
+
+    Returns:
+    --------
+                { float }           : Seconds to wait before retrying, 0 if the header is missing 
+                                      or not given in seconds
+    """
+    if (not isinstance(request_error, httpx.HTTPStatusError)):
+        return 0.0
+
+    try:
+        return max(0.0, float(request_error.response.headers.get("retry-after", "0")))
+
+    except ValueError:
+        return 0.0
+
+
+# HELPER : PROMPT FIELDS OF A LINKEDIN POST
+def get_post_fields(linkedin_post: dict) -> tuple:
+    """
+    Extract the fields of a LinkedIn post which go into the prompt, with line breaks flattened
+
+    Arguments:
+    ----------
+        linkedin_post { dict } : The LinkedIn post scraped, in a python dictionary format (JSON)
+
+    Returns:
+    --------
+             { tuple }         : (poster_name, about, description) of the post
+    """
+    return ((linkedin_post.get('name') or '').translate(NEWLINE_TRANSLATION),
+            (linkedin_post.get('about') or '').translate(NEWLINE_TRANSLATION),
+            (linkedin_post.get('description') or '').translate(NEWLINE_TRANSLATION),
+           )
+
+
+# HELPER : REQUEST BODY OF THE CHAT COMPLETIONS ENDPOINT
+def build_completion_payload(system_prompt: str, user_prompt: str) -> dict:
+    """
+    Build the request body of a chat completion for the configured GPT model
+
+    Arguments:
+    ----------
+        system_prompt { str } : The static instructions
+
+        user_prompt   { str } : The user message carrying the LinkedIn post(s)
+
+    Returns:
+    --------
+             { dict }         : The request body, JSON mode guarantees a parseable response
+    """
+    return {"model"           : OPENAI_MODEL_NAME,
+            "messages"        : [{"role": "system", "content": system_prompt},
+                                 {"role": "user",   "content": user_prompt},
+                                ],
+            "response_format" : {"type": "json_object"},
+            "temperature"     : MODEL_TEMPERATURE,
+            "seed"            : SEED,
+            "max_tokens"      : MAX_TOKENS,
+           }
+
+
+# HELPER : CHAT COMPLETION REQUEST WITH RATE LIMITING AND RETRIES
+async def request_chat_completion(openai_client_instance: httpx.AsyncClient, system_prompt: str, user_prompt: str) -> str:
+    """
+    Send a single chat completion request to the OpenAI API, retrying rate limited and 
+    transient failures with backoff
+
+    Arguments:
+    ----------
+        openai_client_instance { httpx.AsyncClient } : The shared OpenAI API client
+
+        system_prompt                { str }         : The static instructions
+
+        user_prompt                  { str }         : The user message carrying the LinkedIn post(s)
+
+    Errors:
+    -------
+        httpx.HTTPError                               : If the request still fails after MAX_RETRIES 
+                                                        attempts or fails with a non-retryable error
+
+        TimeoutError                                  : If the attempts together take longer than 
+                                                        COMPLETION_TIMEOUT seconds
+
+    Returns:
+    --------
+                                     { str }         : The text content of the response message
+    """
+    # Request payload of the chat completions endpoint
+    completion_payload     = build_completion_payload(system_prompt = system_prompt, 
+                                                      user_prompt   = user_prompt)
+
+    # At most MAX_CONCURRENCY GPT requests of this process are in flight at the same time
+    async with get_gpt_request_semaphore():
+        # The time budget covers the retries of this call only, waiting for a free slot does not count
+        async with asyncio.timeout(COMPLETION_TIMEOUT):
+            for attempt in range(MAX_RETRIES):
+                try:
+                    # Keep the request rate within RPM_LIMIT
+                    await get_gpt_request_bucket().acquire()
+
+                    # Ask GPT to get the response, POSTing directly to the chat completions endpoint
+                    raw_gpt_response = await openai_client_instance.post(url  = "/chat/completions", 
+                                                                         json = completion_payload)
+                    raw_gpt_response.raise_for_status()
+
+                    # If successful, break out of the retry loop
+                    break  
+    
+                except (httpx.HTTPStatusError, httpx.TransportError) as AttemptException:
+                    is_retryable = (isinstance(AttemptException, httpx.TransportError) or 
+                                    (AttemptException.response.status_code in RETRYABLE_STATUS_CODES))
+
+                    if (is_retryable and (attempt < (MAX_RETRIES - 1))):
+                        # Capped exponential backoff with full jitter, so concurrent retries do not line up
+                        exponential_delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+                        # The server tells how long to wait on a rate limit, never retry earlier than that
+                        retry_delay       = max(get_retry_after(AttemptException), exponential_delay)
+            
+                        # Give a warning of rate limit error
+                        logger.warning(f"Rate limited or transient error ({AttemptException!r}). Retrying in {retry_delay:.2f} seconds...")
+            
+                        # Sleep for the calculated delay
+                        await asyncio.sleep(delay = retry_delay)
+        
+                    else:
+                        raise
+
+    # Extract only the text part from the raw response body, skipping any response model construction
+    return orjson.loads(raw_gpt_response.content)["choices"][0]["message"]["content"].strip()
+
+
+# HELPER : POST PROCESS A PARSED GPT RESPONSE INTO THE FINAL OUTPUT
+def finalize_extracted_info(extracted_info: dict, poster_name: str) -> dict:
+    """
+    Post-process the parsed GPT response of a single LinkedIn post into the final output format
+
+    Arguments:
+    ----------
+        extracted_info { dict } : The parsed GPT response of a single LinkedIn post
+
+        poster_name    { str }  : Name key in the LinkedIn post, used if post-processing fails
+
+    Returns:
+    --------
+              { dict }          : The final extraction result of the LinkedIn post
+    """
+    # Apply post-processing for deleting unnecessary information, if present
+    post_processing_result           = post_process_extracted_info(extracted_data = extracted_info.get('extracted_info', []))
+
+    # Check if post processing result is correct or not
+    if (not isinstance(post_processing_result, dict)):
+        logger.warning(msg   = "Post-processing failed", 
+                       extra = {"request_id": "data_extraction"})
+        
+        return {"poster_name"    : poster_name,
+                "post_category"  : "5",
+                "change_count"   : 0,
+                "relevant"       : False,
+                "extracted_info" : [],
+                "error"          : post_processing_result,
+               }
+
+    # Replace the post processed information in final response
+    extracted_info['extracted_info'] = post_processing_result['extracted_info']
+    extracted_info['change_count']   = post_processing_result['change_count']
+    extracted_info['relevant']       = post_processing_result['relevant']
+    
+    # Prepare final output data
+    return {"poster_name"    : extracted_info.get("poster_name"),
+            "post_category"  : extracted_info.get("post_category"),
+            "change_count"   : extracted_info.get("change_count"),
+            "relevant"       : extracted_info.get("relevant"),
+            "extracted_info" : extracted_info.get("extracted_info", []),
+           }
+
+
+# HELPER : PARSE AND POST PROCESS A GPT RESPONSE, OFF THE EVENT LOOP
+def parse_extracted_info(response_text: str, poster_name: str) -> dict:
+    """
+    Parse the GPT response text of a single LinkedIn post and post-process it into the final 
+    output format
+
+    This is CPU-bound work without any I/O, extract_information runs it in a worker thread so 
+    that many responses arriving together do not stall the other in-flight requests
+
+    Arguments:
+    ----------
+        response_text { str } : JSON text of the GPT response
+
+        poster_name   { str } : Name key in the LinkedIn post, used if post-processing fails
+
+    Errors:
+    -------
+        orjson.JSONDecodeError : If the response text is not valid JSON
+
+    Returns:
+    --------
+              { dict }        : The final extraction result of the LinkedIn post
+    """
+    return finalize_extracted_info(extracted_info = orjson.loads(response_text), 
+                                   poster_name    = poster_name)
+
+
 # EXTRACT INFORMATION FROM LINKEDIN POSTS USING OPENAI GPT CLIENT
 async def extract_information(linkedin_post: dict) -> dict:
     """
@@ -56,14 +282,12 @@ async def extract_information(linkedin_post: dict) -> dict:
         logger.error(msg   = error_message, 
                      extra = {"request_id": "data_extraction"})
         
-        return error_message_2
+        return error_message
 
     
     try:
         # Extract only required parts from the input linkedin_post variable
-        poster_name                   = linkedin_post.get('name', None).replace('\n', ' ')
-        about                         = linkedin_post.get('about', None).replace('\n', ' ')
-        description                   = linkedin_post.get('description', None).replace('\n', ' ')
+        poster_name, about, description = get_post_fields(linkedin_post = linkedin_post)
         
         # Also, extract some auxiliary keys and their corresponding values for output generation
         user_profile_url              = linkedin_post.get('userProfileUrl', None)
@@ -71,114 +295,78 @@ async def extract_information(linkedin_post: dict) -> dict:
         search_job_title              = linkedin_post.get('searchJobTitle', None)
         company_links                 = linkedin_post.get('companyLinks', [])
 
-        # Create the data extraction and classification prompt
-        data_extraction_prompt_result = await create_prompt(poster_name = poster_name,
-                                                            about       = about,
-                                                            description = description)
+        # Identical posts are answered from the cache instead of calling GPT again
+        cache_key                     = build_cache_key(poster_name = poster_name,
+                                                        about       = about,
+                                                        description = description)
+        extracted_info                = await get_cached_response(cache_key = cache_key)
+
+        if (extracted_info is not None):
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(msg   = "Using the cached GPT response", 
+                            extra = {"request_id": "data_extraction"})
+
+            # Apply post-processing and prepare final output data
+            final_output              = finalize_extracted_info(extracted_info = extracted_info, 
+                                                                poster_name    = poster_name)
+
+        else:
+            # Create the data extraction and classification prompt
+            data_extraction_prompt_result = create_prompt(poster_name = poster_name,
+                                                          about       = about,
+                                                          description = description)
         
-        # Check if prompt has been created successfully or not
-        if ("Error" in data_extraction_prompt_result):
-            logger.warning(msg   = "Prompt creation failed", 
-                           extra = {"request_id": "data_extraction"})
+            # Check if prompt has been created successfully or not
+            if ("Error" in data_extraction_prompt_result):
+                logger.warning(msg   = "Prompt creation failed", 
+                               extra = {"request_id": "data_extraction"})
             
-            return {'name'           : poster_name,
-                    'about'          : about,
-                    'description'    : description,
-                    'userProfileUrl' : user_profile_url,
-                    'source'         : data_source,
-                    'searchJobTitle' : search_job_title,
-                    'companyLinks'   : company_links,
-                    'error'          : data_extraction_prompt_result,
-                   } 
+                return {'name'           : poster_name,
+                        'about'          : about,
+                        'description'    : description,
+                        'userProfileUrl' : user_profile_url,
+                        'source'         : data_source,
+                        'searchJobTitle' : search_job_title,
+                        'companyLinks'   : company_links,
+                        'error'          : data_extraction_prompt_result,
+                       } 
         
         
-        # Create OpenAI Client 
-        openai_client_instance = await create_openai_client()
+            # Get the shared OpenAI API client 
+            openai_client_instance = await get_openai_client()
 
-        if (isinstance(openai_client_instance, str)):
-            logger.warning(msg   = "OpenAI client creation failed", 
-                           extra = {"request_id": "data_extraction"})
+            if (isinstance(openai_client_instance, str)):
+                logger.warning(msg   = "OpenAI client creation failed", 
+                               extra = {"request_id": "data_extraction"})
             
-            return {'name'           : poster_name,
-                    'about'          : about,
-                    'description'    : description,
-                    'userProfileUrl' : user_profile_url,
-                    'source'         : data_source,
-                    'searchJobTitle' : search_job_title,
-                    'companyLinks'   : company_links,
-                    'error'          : openai_client_instance,
-                   } 
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                # Ask GPT to get the response
-                raw_gpt_response = await openai_client_instance.completions.create(model       = OPENAI_MODEL_NAME,
-                                                                                   prompt      = data_extraction_prompt_result,
-                                                                                   temperature = MODEL_TEMPERATURE,
-                                                                                   seed        = SEED,
-                                                                                   max_tokens  = MAX_TOKENS,
-                                                                                  )
-                # If successful, break out of the retry loop
-                break  
-            
-            except Exception as AttemptException:
-                if (("429" in repr(AttemptException)) and (attempt < (MAX_RETRIES - 1))):
-                    # Exponential backoff with jitter when encountering rate limit errors
-                    exponential_delay = BASE_DELAY * (2 ** attempt) + random.uniform(0, 1)
-                    
-                    # Give a warning of rate limit error
-                    logger.warning(f"Rate limited. Retrying in {exponential_delay:.2f} seconds...")
-                    
-                    # Sleep for the calculated delay
-                    await asyncio.sleep(delay = exponential_delay)
-                
-                else:
-                    raise
-
-        # Close the OpenAI client
-        openai_client_instance.close()
-        
-        logger.info(msg   = 'Successfully closed the AsyncOpenAI API client', 
-                    extra = {"request_id": "gpt_data_extractor"}
-                   )
-        
-        # Extract only the text part from the raw response
-        response_text            = raw_gpt_response.choices[0].text.strip()
+                return {'name'           : poster_name,
+                        'about'          : about,
+                        'description'    : description,
+                        'userProfileUrl' : user_profile_url,
+                        'source'         : data_source,
+                        'searchJobTitle' : search_job_title,
+                        'companyLinks'   : company_links,
+                        'error'          : openai_client_instance,
+                       } 
+
+            # Ask GPT to get the response
+            response_text            = await request_chat_completion(openai_client_instance = openai_client_instance,
+                                                                     system_prompt          = SYSTEM_PROMPT,
+                                                                     user_prompt            = data_extraction_prompt_result)
         
-        # Parse the response text into a JSON object
-        extracted_info           = json.loads(s = response_text)
+            # Parse the response text into a JSON object and apply post-processing, off the event loop
+            final_output             = await asyncio.to_thread(parse_extracted_info, response_text, poster_name)
 
-        # Apply post-processing for deleting unnecessary information, if present
-        post_processing_result   = await post_process_extracted_info(extracted_data = extracted_info.get('extracted_info', []))
+            # Only successfully parsed responses are cached
+            await set_cached_response(cache_key     = cache_key, 
+                                      response_text = response_text)
 
-        # Check if post processing result is correct or not
-        if (not isinstance(post_processing_result, dict)):
-            logger.warning(msg   = "Post-processing failed", 
-                           extra = {"request_id": "data_extraction"})
-            
-            return {"poster_name"    : poster_name,
-                    "post_category"  : "5",
-                    "change_count"   : 0,
-                    "relevant"       : False,
-                    "extracted_info" : [],
-                    "error"          : post_processing_result,
-                   }
-
-        # Replace the post processed information in final response
-        extracted_info['extracted_info'] = post_processing_result['extracted_info']
-        extracted_info['change_count']   = post_processing_result['change_count']
-        extracted_info['relevant']       = post_processing_result['relevant']
+        if ("error" in final_output):
+            return final_output
         
-        # Prepare final output data
-        final_output                     = {"poster_name"    : extracted_info.get("poster_name"),
-                                            "post_category"  : extracted_info.get("post_category"),
-                                            "change_count"   : extracted_info.get("change_count"),
-                                            "relevant"       : extracted_info.get("relevant"),
-                                            "extracted_info" : extracted_info.get("extracted_info", []),
-                                           }
-        
-        logger.info(msg   = 'Successfully got data extraction results', 
-                    extra = {"request_id": "data_extraction"})
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(msg   = 'Successfully got data extraction results', 
+                        extra = {"request_id": "data_extraction"})
         
         return final_output
 
@@ -196,3 +384,82 @@ async def extract_information(linkedin_post: dict) -> dict:
                 "extracted_info" : [],
                 "error"          : exception_message,
                }
+
+
+
+# EXTRACT INFORMATION FROM SEVERAL LINKEDIN POSTS WITH A SINGLE GPT REQUEST
+async def extract_information_batch(linkedin_posts: list) -> list:
+    """
+    Process several input LinkedIn posts together: the posts which are not cached yet are sent
+    to GPT in a single request, so the HTTP round trip and the static instructions are paid 
+    once for all of them instead of once per post
+
+    Arguments:
+    ----------
+        linkedin_posts { list } : The LinkedIn posts scraped, each in a python dictionary format 
+                                  (JSON) as expected by extract_information
+
+    Returns:
+    --------
+              { list }          : The results of extract_information for every post, in the 
+                                  same order as the posts
+
+    Note:
+    -----
+        - If the batched request fails or its response does not hold exactly one result object 
+          per post, every post falls back to its own extract_information call
+    """
+    if (len(linkedin_posts) < 2):
+        return [await extract_information(linkedin_post = linkedin_post) for linkedin_post in linkedin_posts]
+
+    try:
+        # Extract only required parts from every input linkedin_post
+        post_fields    = [get_post_fields(linkedin_post = linkedin_post) for linkedin_post in linkedin_posts]
+
+        # Posts already in the cache are not sent to GPT again
+        cache_keys     = [build_cache_key(*fields) for fields in post_fields]
+        cached_infos   = await asyncio.gather(*(get_cached_response(cache_key = cache_key) for cache_key in cache_keys))
+
+        results        = [None if (cached_info is None) else finalize_extracted_info(extracted_info = cached_info, poster_name = fields[0])
+                          for fields, cached_info in zip(post_fields, cached_infos)]
+        missing        = [position for position, result in enumerate(results) if (result is None)]
+
+        if (len(missing) == 1):
+            results[missing[0]] = await extract_information(linkedin_post = linkedin_posts[missing[0]])
+
+        elif missing:
+            openai_client_instance = await get_openai_client()
+
+            if (isinstance(openai_client_instance, str)):
+                raise RuntimeError(openai_client_instance)
+
+            # Ask GPT for all the missing posts at once
+            response_text          = await request_chat_completion(openai_client_instance = openai_client_instance,
+                                                                   system_prompt          = BATCH_SYSTEM_PROMPT,
+                                                                   user_prompt            = create_batch_prompt([post_fields[position] for position in missing]))
+
+            batch_infos            = (await asyncio.to_thread(orjson.loads, response_text)).get('results')
+
+            # Validate the batched response before distributing it back to the posts
+            if ((not isinstance(batch_infos, list)) or (len(batch_infos) != len(missing)) or 
+                (not all(isinstance(extracted_info, dict) for extracted_info in batch_infos))):
+                raise ValueError(f"Expected {len(missing)} result objects in the batched GPT response")
+
+            for position, extracted_info in zip(missing, batch_infos):
+                # Every post is cached on its own, so it is also found by single post requests
+                await set_cached_response(cache_key     = cache_keys[position], 
+                                          response_text = orjson.dumps(extracted_info).decode())
+
+                results[position] = finalize_extracted_info(extracted_info = extracted_info, 
+                                                            poster_name    = post_fields[position][0])
+
+            logger.info('Successfully got data extraction results of %d posts in one request', len(missing), 
+                        extra = {"request_id": "data_extraction"})
+
+        return results
+
+    except Exception as BatchExtractionError:
+        logger.warning(msg   = f"BatchExtractionError: Falling back to one request per post, got: {repr(BatchExtractionError)}", 
+                       extra = {"request_id": "data_extraction"})
+
+        return list(await asyncio.gather(*(extract_information(linkedin_post = linkedin_post) for linkedin_post in linkedin_posts)))
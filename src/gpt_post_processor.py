@@ -1,17 +1,43 @@
 # DEPENDENCIES
+import re
 import logging
-import warnings
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
 
 
 # LOGGING 
 logger = logging.getLogger(__name__)
 
 
-# HELPER : POST PROCESS RAW RESPONSES BY GPT INSTRUCT MODEL
-async def post_process_extracted_info(extracted_data: list) -> dict:
+# KEYWORDS OF ROLES WHICH DO NOT COUNT AS A JOB CHANGE, MATCHED CASE-INSENSITIVELY IN ONE SCAN
+EXCLUDED_ROLE_PATTERN = re.compile(r"retiring|leaving", re.IGNORECASE)
+
+
+# HELPER : CHECK A SINGLE EXTRACTED ENTRY
+def is_relevant_change(info: dict) -> bool:
+    """
+    Checks in a single pass whether an extracted entry is kept: none of its fields may be 
+    "Unknown" and its new role must not be about retiring or leaving a job
+
+    Arguments:
+    ----------
+        info { dict } : A single extracted entry with person_name, organization and new_role
+
+    Returns:
+    --------
+           { bool }   : True if the entry is kept, False otherwise
+    """
+    new_role = info.get('new_role', 'Unknown')
+
+    if (new_role == 'Unknown'):
+        return False
+
+    if EXCLUDED_ROLE_PATTERN.search(new_role):
+        return False
+
+    return all((value != 'Unknown') for value in info.values())
+
+
+# HELPER : POST PROCESS RAW RESPONSES BY GPT MODEL
+def post_process_extracted_info(extracted_data: list) -> dict:
     """
     Post process the extracted data by GPT model and returns cleaned data
 
@@ -42,16 +68,8 @@ async def post_process_extracted_info(extracted_data: list) -> dict:
         return input_error_message
     
     try:
-        # Remove any entries where any of the three key fields is "Unknown"
-        cleaned_info        = [info for info in extracted_data if all(info[key] != "Unknown" for key in info.keys())]
-
-        # Update new_role to "Unknown" if it contains keywords like retiring or leaving
-        for info in cleaned_info:
-            if (('retiring' in info['new_role'].lower()) or ('leaving' in info['new_role'].lower())):
-                info['new_role'] = 'Unknown'
-
-        # Perform another cleaning step to remove entries where new_role is "Unknown" after the update
-        final_cleaned_info  = [info for info in cleaned_info if info['new_role'] != 'Unknown']
+        # Remove entries with any "Unknown" field or with a retiring / leaving role, in a single pass
+        final_cleaned_info  = [info for info in extracted_data if is_relevant_change(info)]
 
         # Update change_count
         change_count        = len(final_cleaned_info)
@@ -64,8 +82,9 @@ async def post_process_extracted_info(extracted_data: list) -> dict:
                                'change_count'   : change_count,
                                'relevant'       : relevant}
         
-        logger.info(msg   = 'Successfully post-processed the extracted data from LinkedIn post', 
-                    extra = {"request_id": "post_processing"})
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(msg   = 'Successfully post-processed the extracted data from LinkedIn post', 
+                        extra = {"request_id": "post_processing"})
         
         return post_processed_dict
     
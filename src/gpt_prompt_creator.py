@@ -1,20 +1,104 @@
 # DEPENDENCIES
 import logging
-import warnings
-
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+import textwrap
 
 
 # LOGGING 
 logger = logging.getLogger(__name__)
 
 
-async def create_prompt(poster_name:str, about:str, description:str) -> str:
+# VERSION OF THE PROMPT, BUMP ON EVERY PROMPT CHANGE TO INVALIDATE THE CACHED GPT RESPONSES
+PROMPT_VERSION = "v4"
+
+
+# SYSTEM PROMPT WITH THE STATIC DATA EXTRACTION INSTRUCTIONS, BUILT ONCE AT IMPORT TIME
+# The instructions are byte-identical across calls and hit the server-side prompt cache, while the post 
+# itself is sent afterwards as the user message; dedent keeps the whitespace stable and compact
+SYSTEM_PROMPT        = textwrap.dedent("""\
+    Analyze the LinkedIn post given in the INPUT section of the user message throughly and classify it based on job-related announcements:
+
+    Step 1: Classification
+    Determine if this post is about any of the following:
+    1. New job joining (either within the same company or a new company)
+    2. Job change or transition
+    3. Promotion within the same company
+    4. Leadership change or appointment
+    5. Other (not related to the above categories)
+
+    Step 2: Information Extraction
+    If the post falls into categories 1-4, extract the following information for each relevant mention:
+    - Remove any solutions eg: Mr. Mrs. Dr. Prof. or title or degree or something rather than the name
+      itself only, present after or before the name given as "Post by" in the INPUT section
+    - Full name of the person mentioned (who got the new job, promotion, or new role), but exclude any 
+      solutions eg: Mr. Mrs. Dr. Prof.  or title or degree or something rather than the name itself only, 
+      present after or before the name
+    - Full name of the organization (current or new)
+    - New job title or role
+
+    Important:
+    - Ignore all kinds of hiring announcements for positions that are not filled yet or do not mention a
+      specific individual's job change. For example, if the post says "I am hiring for a Finance Manager," 
+      this should be ignored.
+    - Ignore those individuals or persons who are retiring or leaving job
+    - Include those who are leaving a role or position but joining another role or position.
+    - Ignore positions like "Shareholder", "Owner", "Proprietor", "Insider", or similar titles. 
+    - Specifically, exclude roles that do not indicate a significant change in responsibilities or title.
+
+    Format the response as a JSON object with the following structure:
+    {
+           "poster_name": "[modified poster_name]",
+           "post_category": "[Category number from Step 1]",
+           "change_count": [number of changes],
+           "relevant": [true/false],
+           "extracted_info": [
+               {
+                   "person_name": "[Full Name of the person mentioned]",
+                   "organization": "[Full Name of the Organization]",
+                   "new_role": "[New Job Title or Role]"
+               },
+               ...
+           ]
+    }
+
+    Ensure high accuracy in classification and information extraction. If any information is
+    uncertain or not explicitly mentioned, use "Unknown" as the value.
+
+    Provide only the JSON object as your response, with no additional text before or after.
+    """)
+
+
+# USER PROMPT TEMPLATE CARRYING THE LINKEDIN POST
+USER_PROMPT_TEMPLATE = textwrap.dedent("""\
+    ### INPUT
+    Post by: {poster_name}
+    About: {about}
+    Description: {description}
+    """)
+
+
+# SYSTEM PROMPT FOR SEVERAL LINKEDIN POSTS IN A SINGLE REQUEST, THE SAME INSTRUCTIONS APPLIED PER POST
+BATCH_SYSTEM_PROMPT  = SYSTEM_PROMPT + textwrap.dedent("""\
+
+    The INPUT section of the user message contains several LinkedIn posts, marked as ### POST 1, ### POST 2 and so on.
+    Analyze every post independently of the others, exactly as described above, and respond with a single JSON object
+    of the following structure instead, holding one result object per post in the same order as the posts:
+    {"results": [<JSON object as described above for POST 1>, <JSON object as described above for POST 2>, ...]}
+    """)
+
+
+# TEMPLATE OF A SINGLE LINKEDIN POST WITHIN A BATCH USER PROMPT
+BATCH_POST_TEMPLATE  = textwrap.dedent("""\
+    ### POST {post_number}
+    Post by: {poster_name}
+    About: {about}
+    Description: {description}
+    """)
+
+
+def create_prompt(poster_name:str, about:str, description:str) -> str:
     """
-    Create the prompt for GPT model to instruct it how to classify LinkedIn posts and
-    exactly what all information are required to be extracted from the LinkedIn post
+    Create the user prompt for GPT model carrying the LinkedIn post to classify and extract
+    information from, the instructions themselves are sent as SYSTEM_PROMPT
 
     Arguments:
     ----------
@@ -32,7 +116,7 @@ async def create_prompt(poster_name:str, about:str, description:str) -> str:
 
     Returns:
     --------
-               { str }        : A python string, which is the final and formatted with proper 
+               { str }        : A python string, which is the user message formatted with proper 
                                 inputs for OpenAI client 
     """
     # Input type checking 
@@ -61,65 +145,15 @@ async def create_prompt(poster_name:str, about:str, description:str) -> str:
         return description_error
 
     try:
-        # Define the prompt
-        data_extraction_prompt = f"""
-                                     Analyze the following LinkedIn post throughly and classify it based on job-related announcements:
-                                            
-                                     Post by: {poster_name}
-                                     About: {about}
-                                     Description: {description}
-
-                                     Step 1: Classification
-                                     Determine if this post is about any of the following:
-                                     1. New job joining (either within the same company or a new company)
-                                     2. Job change or transition
-                                     3. Promotion within the same company
-                                     4. Leadership change or appointment
-                                     5. Other (not related to the above categories)
-
-                                     Step 2: Information Extraction
-                                     If the post falls into categories 1-4, extract the following information for each relevant mention:
-                                     - Remove any solutions eg: Mr. Mrs. Dr. Prof. or title or degree or something rather than the name
-                                       itself only, present after or before the name : {poster_name}
-                                     - Full name of the person mentioned (who got the new job, promotion, or new role), but exclude any 
-                                       solutions eg: Mr. Mrs. Dr. Prof.  or title or degree or something rather than the name itself only, 
-                                       present after or before the name
-                                     - Full name of the organization (current or new)
-                                     - New job title or role
-
-                                     Important:
-                                     - Ignore all kinds of hiring announcements for positions that are not filled yet or do not mention a
-                                       specific individual's job change. For example, if the post says "I am hiring for a Finance Manager," 
-                                       this should be ignored.
-                                     - Ignore those individuals or persons who are retiring or leaving job
-                                     - Include those who are leaving a role or position but joining another role or position.
-                                     - Ignore positions like "Shareholder", "Owner", "Proprietor", "Insider", or similar titles. 
-                                     - Specifically, exclude roles that do not indicate a significant change in responsibilities or title.
-
-                                     Format the response as a JSON object with the following structure:
-                                     {{
-                                            "poster_name": "[modified poster_name]",
-                                            "post_category": "[Category number from Step 1]",
-                                            "change_count": [number of changes],
-                                            "relevant": [true/false],
-                                            "extracted_info": [
-                                                {{
-                                                    "person_name": "[Full Name of the person mentioned]",
-                                                    "organization": "[Full Name of the Organization]",
-                                                    "new_role": "[New Job Title or Role]"
-                                                }},
-                                                ...
-                                            ]
-                                     }}
-
-                                     Ensure high accuracy in classification and information extraction. If any information is
-                                     uncertain or not explicitly mentioned, use "Unknown" as the value.
-
-                                     Provide only the JSON object as your response, with no additional text before or after.
-                                  """
+        # Fill the dynamic parts into the prebuilt template
+        data_extraction_prompt = USER_PROMPT_TEMPLATE.format_map({"poster_name" : poster_name,
+                                                                   "about"       : about,
+                                                                   "description" : description,
+                                                                  })
         
-        logger.info(msg   = "Successfully created the prompt for data extraction", 
-                    extra = {"request_id": "prompt_creation"})
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(msg   = "Successfully created the prompt for data extraction", 
+                        extra = {"request_id": "prompt_creation"})
         
         return data_extraction_prompt
     
@@ -130,4 +164,26 @@ async def create_prompt(poster_name:str, about:str, description:str) -> str:
                      extra    = {"request_id": "prompt_creation"}, 
                      exc_info = True)
         
-        return exception_message
\ No newline at end of file
+        return exception_message
+
+
+def create_batch_prompt(posts: list) -> str:
+    """
+    Create the user prompt for GPT model carrying several LinkedIn posts at once, to be sent 
+    along with BATCH_SYSTEM_PROMPT
+
+    Arguments:
+    ----------
+        posts { list } : (poster_name, about, description) string tuples of the LinkedIn posts
+
+    Returns:
+    --------
+           { str }     : A python string, which is the user message with the numbered posts
+    """
+    post_prompts = [BATCH_POST_TEMPLATE.format_map({"post_number" : post_number,
+                                                    "poster_name" : poster_name,
+                                                    "about"       : about,
+                                                    "description" : description,
+                                                   }) for post_number, (poster_name, about, description) in enumerate(posts, start = 1)]
+
+    return "### INPUT\n" + "\n".join(post_prompts)
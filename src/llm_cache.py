@@ -0,0 +1,219 @@
+# DEPENDENCIES
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import orjson
+import aiosqlite
+from typing import Optional
+from .model_config import CACHE_TTL
+from .model_config import CACHE_COMMIT_DELAY
+from .model_config import CACHE_PURGE_INTERVAL
+from .model_config import CACHE_DB_PATH
+from .model_config import OPENAI_MODEL_NAME
+from .gpt_prompt_creator import PROMPT_VERSION
+
+
+# LOGGING
+logger = logging.getLogger(__name__)
+
+
+# SHARED CACHE DATABASE CONNECTION, OPENED LAZILY ON FIRST USE
+_cache_connection      = None
+_cache_connection_lock = asyncio.Lock()
+
+# PENDING DEFERRED COMMIT OF THE CACHE WRITES, AND THE LAST TIME THE EXPIRED ENTRIES WERE DELETED
+_pending_commit        = None
+_last_purge            = 0.0
+
+
+# CACHE KEY OF A LINKEDIN POST
+def build_cache_key(poster_name: str, about: str, description: str) -> str:
+    """
+    Build the content-addressable cache key of a LinkedIn post: the SHA-256 of the post fields,
+    the model name and the prompt version
+
+    Every part is length-prefixed before hashing, so that different splits of the same text
+    (e.g. moving a word from about to description) can not produce the same key
+
+    Arguments:
+    ----------
+        poster_name { str } : Name key in the LinkedIn post, as per scraped data
+
+        about       { str } : A brief information about the LinkedIn poster, as per scraped data
+
+        description { str } : The main post, as per scraped data
+
+    Returns:
+    --------
+              { str }       : Hex digest of the SHA-256 hash
+    """
+    key_hash = hashlib.sha256()
+
+    for part in (poster_name, about, description, OPENAI_MODEL_NAME, PROMPT_VERSION):
+        encoded_part = part.encode('utf-8')
+
+        key_hash.update(len(encoded_part).to_bytes(8, 'big'))
+        key_hash.update(encoded_part)
+
+    return key_hash.hexdigest()
+
+
+# HELPER : DELETE THE EXPIRED CACHE ENTRIES
+async def purge_expired_responses(cache_connection: aiosqlite.Connection) -> None:
+    """
+    Delete the cache entries older than CACHE_TTL, which are never returned any more; this also
+    drops the entries of former prompt versions and models, whose keys are not built any more
+
+    Arguments:
+    ----------
+        cache_connection { aiosqlite.Connection } : The shared connection to the cache database
+    """
+    global _last_purge
+
+    _last_purge = time.time()
+
+    await cache_connection.execute("DELETE FROM cache WHERE created_at < ?", (int(_last_purge - CACHE_TTL),))
+
+
+# HELPER : COMMIT THE CACHE WRITES OF THE LAST CACHE_COMMIT_DELAY SECONDS AT ONCE
+async def commit_cached_responses(cache_connection: aiosqlite.Connection) -> None:
+    """
+    Wait CACHE_COMMIT_DELAY seconds, then commit all the cache writes made meanwhile in a single
+    transaction, deleting the expired entries once every CACHE_PURGE_INTERVAL seconds as well
+
+    Arguments:
+    ----------
+        cache_connection { aiosqlite.Connection } : The shared connection to the cache database
+    """
+    await asyncio.sleep(CACHE_COMMIT_DELAY)
+
+    try:
+        if ((time.time() - _last_purge) > CACHE_PURGE_INTERVAL):
+            await purge_expired_responses(cache_connection = cache_connection)
+
+        await cache_connection.commit()
+
+    except Exception as CacheCommitError:
+        logger.warning(msg   = f"CacheCommitError: Could not commit the cached GPT responses, got: {repr(CacheCommitError)}",
+                       extra = {"request_id": "response_cache"})
+
+
+# SHARED CACHE CONNECTION ACCESSOR
+async def get_cache_connection() -> aiosqlite.Connection:
+    """
+    Returns the process-wide connection to the cache database, creating the database and its
+    table on first use
+
+    Returns:
+    --------
+        { aiosqlite.Connection } : The shared connection to the cache database
+    """
+    global _cache_connection
+
+    if _cache_connection is not None:
+        return _cache_connection
+
+    async with _cache_connection_lock:
+        if _cache_connection is None:
+            os.makedirs(os.path.dirname(CACHE_DB_PATH) or '.', exist_ok = True)
+
+            cache_connection = await aiosqlite.connect(CACHE_DB_PATH)
+
+            # WAL lets the worker processes read the cache while one of them is writing
+            await cache_connection.execute("PRAGMA journal_mode=WAL")
+            await cache_connection.execute("CREATE TABLE IF NOT EXISTS cache (hash TEXT PRIMARY KEY, response TEXT, created_at INT)")
+            await purge_expired_responses(cache_connection = cache_connection)
+            await cache_connection.commit()
+
+            _cache_connection = cache_connection
+
+    return _cache_connection
+
+
+# CACHE LOOKUP
+async def get_cached_response(cache_key: str) -> Optional[dict]:
+    """
+    Look up the parsed GPT response of a LinkedIn post in the cache
+
+    Arguments:
+    ----------
+        cache_key { str } : Key built by build_cache_key
+
+    Returns:
+    --------
+         { dict }         : The parsed GPT response, or None if the key is missing, expired,
+                            unusable or the cache is not available
+    """
+    try:
+        cache_connection = await get_cache_connection()
+
+        async with cache_connection.execute("SELECT response, created_at FROM cache WHERE hash = ?", (cache_key,)) as cursor:
+            cached_row = await cursor.fetchone()
+
+        if ((cached_row is None) or ((time.time() - cached_row[1]) > CACHE_TTL)):
+            return None
+
+        cached_response = orjson.loads(cached_row[0])
+
+        # Revalidate the recalled response before trusting it
+        if ((not isinstance(cached_response, dict)) or (not isinstance(cached_response.get('extracted_info', []), list))):
+            return None
+
+        return cached_response
+
+    except Exception as CacheReadError:
+        logger.warning(msg   = f"CacheReadError: Ignoring the response cache, got: {repr(CacheReadError)}",
+                       extra = {"request_id": "response_cache"})
+
+        return None
+
+
+# CACHE STORE
+async def set_cached_response(cache_key: str, response_text: str) -> None:
+    """
+    Store the raw (already successfully parsed) GPT response of a LinkedIn post in the cache; 
+    the write is committed together with the others of the next CACHE_COMMIT_DELAY seconds
+
+    Arguments:
+    ----------
+        cache_key     { str } : Key built by build_cache_key
+
+        response_text { str } : JSON text of the GPT response
+    """
+    global _pending_commit
+
+    try:
+        cache_connection = await get_cache_connection()
+
+        await cache_connection.execute("INSERT OR REPLACE INTO cache (hash, response, created_at) VALUES (?, ?, ?)",
+                                       (cache_key, response_text, int(time.time())))
+
+        if ((_pending_commit is None) or _pending_commit.done()):
+            _pending_commit = asyncio.create_task(commit_cached_responses(cache_connection = cache_connection))
+
+    except Exception as CacheWriteError:
+        logger.warning(msg   = f"CacheWriteError: Could not cache the GPT response, got: {repr(CacheWriteError)}",
+                       extra = {"request_id": "response_cache"})
+
+
+# SHARED CACHE CONNECTION CLEANUP
+async def close_llm_cache() -> None:
+    """
+    Commits the pending cache writes and closes the shared connection to the cache database, 
+    if it has been opened
+    """
+    global _cache_connection
+    global _pending_commit
+
+    if ((_pending_commit is not None) and (not _pending_commit.done())):
+        _pending_commit.cancel()
+
+    _pending_commit = None
+
+    if _cache_connection is not None:
+        await _cache_connection.commit()
+        await _cache_connection.close()
+
+        _cache_connection = None
@@ -1,63 +1,158 @@
 # DEPENDEBNCIES
 import os
+import queue
+import atexit
 import logging
+import itertools
+from contextvars import ContextVar
+from functools import lru_cache
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 from logging.handlers import RotatingFileHandler
 
 
-# CUSTOM FORMATTER OF THE LOGGING PARAMETERS
-class CustomFormatter(logging.Formatter):
-    def format(self, record):
-        if (not hasattr(record, 'request_id')):
-            record.request_id = 'N/A'
+# DEFAULTS OF THE CONTEXT FIELDS, FOR RECORDS LOGGED WITHOUT A REQUEST / BATCH CONTEXT
+LOG_CONTEXT_DEFAULTS = {"request_id"    : 'N/A',
+                        "batch_id"      : 'N/A',
+                        "batch_item_id" : 'N/A',
+                       }
 
-        if (not hasattr(record, 'batch_id')):
-            record.batch_id = 'N/A'
 
-        if (not hasattr(record, 'batch_item_id')):
-            record.batch_item_id = 'N/A'
+# REQUEST ID OF THE HTTP REQUEST BEING HANDLED, SET BY THE RequestIDMiddleware
+REQUEST_ID = ContextVar("request_id", default = LOG_CONTEXT_DEFAULTS["request_id"])
 
-        return super().format(record)
 
+# FILTER FILLING IN THE REQUEST ID FROM THE CONTEXT
+class RequestIDFilter(logging.Filter):
+    """
+    Adds the request id of the current context to every record, so the log calls made while
+    handling a request do not have to pass it in an `extra` dict; an explicit request_id in
+    `extra` (e.g. the fixed labels of the background components) is kept as it is
+    """
+    def filter(self, record):
+        record.__dict__.setdefault('request_id', REQUEST_ID.get())
+        return True
 
-# LOGGING CONFIGURATION
-def setup_logging():
-    logging.basicConfig(level=logging.INFO)
-    logger     = logging.getLogger()
 
-    # Create console handler
-    c_handler  = logging.StreamHandler()
+# SAMPLING FILTER FOR PER-BATCH LOG RECORDS
+class BatchLogSampler(logging.Filter):
+    """
+    Always keeps warnings, errors and records which are not tied to a batch, but once the log 
+    queue is backed up by more than `backlog` records, only forwards one out of `sample_every` 
+    per-batch INFO / DEBUG records
+    """
+    def __init__(self, log_queue: queue.SimpleQueue, backlog: int = 1000, sample_every: int = 100):
+        super().__init__()
+        self.log_queue    = log_queue
+        self.backlog      = backlog
+        self.sample_every = sample_every
+        self.counter      = itertools.count()
 
-    # Create formatter and add it to the console handler
-    log_format = "%(name)s | %(levelname)s | Request ID: %(request_id)s | Batch: %(batch_id)s | Item: %(batch_item_id)s | %(message)s"
-    c_format   = CustomFormatter(log_format)
-    c_handler.setFormatter(c_format)
+    def filter(self, record):
+        if (record.levelno >= logging.WARNING):
+            return True
+
+        if (getattr(record, 'batch_id', 'N/A') in ('N/A', 'All')):
+            return True
+
+        if (self.log_queue.qsize() < self.backlog):
+            return True
+
+        return (next(self.counter) % self.sample_every == 0)
 
-    # Add console handler to the logger
-    logger.addHandler(c_handler)
 
+# QUEUE HANDLER DEFERRING THE MESSAGE FORMATTING TO THE LISTENER THREAD
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler which enqueues the record as it is: the stock prepare() merges the message
+    with its arguments (and renders any traceback) on the logging thread, which here is the
+    event loop. The records never leave the process, so the listener thread can do that work
+    """
+    def prepare(self, record):
+        return record
+
+
+# LOGGER ADAPTER BINDING THE REQUEST / BATCH CONTEXT ONCE
+class RequestLogger(logging.LoggerAdapter):
+    """
+    Attaches a fixed context (request_id, batch_id, batch_item_id) to every record logged 
+    through it, so the context dict is built once per request / batch instead of once per 
+    log call. An explicit `extra` passed to a single call is merged over the bound context
+    """
+    def process(self, msg, kwargs):
+        extra = kwargs.get('extra')
+
+        if extra is None:
+            kwargs['extra'] = self.extra
+
+        else:
+            kwargs['extra'] = {**self.extra, **extra}
+
+        return msg, kwargs
+
+
+# LOG FILE LOOKUP, THE DIRECTORY WALK RUNS ONLY ONCE PER PROCESS
+@lru_cache(maxsize = 1)
+def find_log_file():
     # Check if a log file exists in the current directory or its parent directories
     current_dir = os.getcwd()
-    log_file    = None
 
     while (current_dir != os.path.dirname(current_dir)): # Stop at root directory
-        for file in os.listdir(current_dir):
-            if (file.endswith('.log')):
-                log_file = os.path.join(current_dir, file)
-                break
-
-        if log_file:
-            break
+        with os.scandir(current_dir) as entries:
+            for entry in entries:
+                if (entry.name.endswith('.log')):
+                    return entry.path
 
         current_dir = os.path.dirname(current_dir)
 
+    return None
+
+
+# LOGGING CONFIGURATION
+def setup_logging(level: int = logging.INFO):
+    logger     = logging.getLogger()
+    logger.setLevel(level)
+
+    # The handlers are attached only once per process, repeated calls only change the level
+    if any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        return logger
+
+    # Create console handler
+    c_handler  = logging.StreamHandler()
+
+    # Create formatter and add it to the console handler, the formatter fills in the missing context fields 
+    # without touching the record (a record factory would make `extra` with the same keys raise a KeyError)
+    log_format = "%(name)s | %(levelname)s | Request ID: %(request_id)s | Batch: %(batch_id)s | Item: %(batch_item_id)s | %(message)s"
+    c_format   = logging.Formatter(log_format, defaults = LOG_CONTEXT_DEFAULTS)
+    c_handler.setFormatter(c_format)
+
+    handlers   = [c_handler]
+
+    log_file   = find_log_file()
+
     # If a log file is found, add a file handler
     if log_file:
         f_handler = RotatingFileHandler(filename    = log_file,
                                         maxBytes    = 10*1024*1024,
                                         backupCount = 5,
                                        )
-        f_format  = CustomFormatter(log_format)
+        f_format  = logging.Formatter(log_format, defaults = LOG_CONTEXT_DEFAULTS)
         f_handler.setFormatter(f_format)
-        logger.addHandler(f_handler)
+        handlers.append(f_handler)
+
+    # Callers only enqueue log records, a background thread owns the console / file I/O
+    log_queue     = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+
+    # The handler filters run on the logging thread, where the context of the request is still current
+    queue_handler.addFilter(RequestIDFilter())
+    queue_handler.addFilter(BatchLogSampler(log_queue = log_queue))
+    logger.addHandler(queue_handler)
+
+    listener      = QueueListener(log_queue, *handlers, respect_handler_level = True)
+    listener.start()
+
+    # Flush the remaining records on interpreter exit
+    atexit.register(listener.stop)
 
     return logger
@@ -1,9 +1,33 @@
-# OPENAI GPT-3.5-Turbo HYPERPARAMETERES
-OPENAI_API_KEY    = "your-openai-api-key-here"
-OPENAI_MODEL_NAME = "gpt-3.5-turbo-instruct"
-MAX_RETRIES       = 10
-TIMEOUT           = 30
-MODEL_TEMPERATURE = 0.0
-SEED              = 1234
-MAX_TOKENS        = 2048
-BASE_DELAY        = 1 
\ No newline at end of file
+# OPENAI GPT-4o-mini HYPERPARAMETERES
+OPENAI_API_KEY            = "your-openai-api-key-here"
+OPENAI_BASE_URL           = "https://api.openai.com/v1"
+OPENAI_MODEL_NAME         = "gpt-4o-mini"
+MAX_RETRIES               = 10
+TIMEOUT                   = 30
+MODEL_TEMPERATURE         = 0.0
+SEED                      = 1234
+MAX_TOKENS                = 2048
+BASE_DELAY                = 0.1
+MAX_DELAY                 = 8.0
+COMPLETION_TIMEOUT        = 120
+
+# SHARED HTTP CONNECTION POOL OF THE OPENAI CLIENT (PER WORKER PROCESS)
+MAX_CONNECTIONS           = 256
+MAX_KEEPALIVE_CONNECTIONS = 256
+KEEPALIVE_EXPIRY          = 30.0
+
+# RATE LIMITS OF THE GPT REQUESTS (CONCURRENCY PER WORKER PROCESS, RPM FOR THE WHOLE ACCOUNT)
+MAX_CONCURRENCY           = 64
+RPM_LIMIT                 = 3500
+POSTS_PER_REQUEST         = 5
+
+# OPENAI BATCH API FOR OFFLINE JOBS
+BATCH_COMPLETION_WINDOW   = "24h"
+BATCH_POLL_INTERVAL       = 10.0
+BATCH_MAX_POLL_INTERVAL   = 300.0
+
+# CACHE OF GPT RESPONSES, KEYED BY THE SHA-256 OF THE POST CONTENT
+CACHE_DB_PATH             = "cache/llm_cache.db"
+CACHE_TTL                 = 7 * 24 * 60 * 60
+CACHE_COMMIT_DELAY        = 1.0
+CACHE_PURGE_INTERVAL      = 60 * 60
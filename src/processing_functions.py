@@ -1,20 +1,88 @@
 # DEPENDENCIES
 import logging
-import warnings
+from typing import List
+from typing import Tuple
 from .pydantic_input_classes import InputItemGpt
+from .logging_config import RequestLogger
 from .pydantic_output_classes import OutputItemGpt
 from .gpt_data_extractor import extract_information
-
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+from .gpt_data_extractor import extract_information_batch
+from .gpt_batch_submitter import extract_information_via_batch_api
 
 
 # CONFIGURE THE LOGGING 
 logger = logging.getLogger(__name__)
 
 
-async def process_item_gpt(item: InputItemGpt, index:int, total_count:int, batch_id: int, batch_item_id: int, request_id: str) -> OutputItemGpt:
+def build_output_items(item_data: dict, index: int, extraction_result: dict, item_logger: logging.LoggerAdapter) -> List[OutputItemGpt]:
+    """
+    Format the extraction result of a single input item into OutputItemGpt(s)
+
+    Arguments:
+    ----------
+        item_data           { dict }         : The input item which has been processed, as dumped once
+                                               by the caller
+        
+        index               { int }          : The index of the input item in total input array
+
+        extraction_result   { dict }         : The result of extracting information from the item, 
+                                               or an error message
+
+        item_logger { logging.LoggerAdapter } : Logger bound to the context of the item
+
+    Returns:
+    --------
+        { List[OutputItemGpt] } : One OutputItemGpt per extracted job posting, or a single 
+                                  OutputItemGpt if nothing was extracted or the extraction failed
+    """
+    # If any error occurs in extracting information, catch it and return
+    if isinstance(extraction_result, str):
+        item_logger.warning("Extraction failed for item %d", index + 1)
+        
+        return [OutputItemGpt.build_trusted(**item_data, error = extraction_result)]
+
+    # Define a base structure to align with OutputItem class
+    base_output       = OutputItemGpt.build_trusted(name           = item_data['name'],
+                                                    about          = item_data['about'],
+                                                    description    = item_data['description'],
+                                                    userProfileUrl = item_data['userProfileUrl'],
+                                                    source         = item_data['source'],
+                                                    searchJobTitle = item_data['searchJobTitle'],
+                                                    companyLinks   = item_data['companyLinks'] if item_data['companyLinks'] != None else [],
+                                                    classification = 'Relevant' if extraction_result.get('relevant') else 'Irrelevant',
+                                                    error          = f"IrrelevantData: LinkedIn post is Irrelevant in this context, \
+                                                                       hence no data has been extracted".replace('  ', '') 
+                                                                       if not extraction_result.get('relevant') else None,
+                                                   )
+    
+    # Capture extraction results and populate with objects of OutputItem class
+    extracted_info    = extraction_result.get('extracted_info', [])
+    
+    # If any error occurs in getting extracted_info key, catch it and return
+    if not extracted_info:
+        item_logger.info("No relevant information extracted for item %d", index + 1)
+        
+        return [base_output]
+    
+    # Values shared by all the output items of this post are looked up once
+    poster_name      = extraction_result.get('poster_name')
+    fallback_company = item_data.get('companyName')
+    model_copy       = base_output.model_copy
+
+    # Collect all unit results as shallow copies of the already validated base_output, with only 
+    # the four extracted fields replaced
+    output_items     = [model_copy(update = {"jobPosterName"  : poster_name,
+                                             "jobStarterName" : info.get('person_name'),
+                                             "companyName"    : info.get('organization') or fallback_company,
+                                             "currentRole"    : info.get('new_role'),
+                                            }) for info in extracted_info]
+    
+    item_logger.info("Successfully created response data for item %d", index + 1)
+    
+    return output_items
+
+
+async def process_item_gpt(request_id: str, total_count:int, item: InputItemGpt, index:int, batch_id: int, batch_item_id: int) -> List[OutputItemGpt]:
     """
     Process a single input item asynchronously for GPT model by performing the following steps:
     1. Extracts relevant information using GPT model for classified data
@@ -22,92 +90,124 @@ async def process_item_gpt(item: InputItemGpt, index:int, total_count:int, batch
 
     Arguments:
     ----------
+        request_id    { str }      : The request id which is currently getting processed
+
+        total_count   { int }      : The total count of input array in current request 
+
         item     { InputItemGpt }  : The input item to process
         
         index         { int }      : The index of the input item in total input array
 
-        total_count   { int }      : The total count of input array in current request 
-
         batch_id      { int }      : The id of the current batch
 
         batch_item_id { int }      : The item id of the current batch
-
-        request_id    { str }      : The request id which is currently getting processed
         
     Returns:
     --------
-        { OutputItemGpt }     : A single OutputItemGpt if processing a single job posting or
-                                a list of OutputItemGpt if processing multiple job postings or
-                                an OutputItemGpt with an error message if any step fails
+        { List[OutputItemGpt] } : Always a list: one OutputItemGpt per extracted job posting, or a 
+                                  single OutputItemGpt if nothing was extracted or if any step fails
+                                  (carrying the error message)
 
     Raises:
     -------
         No exceptions has been raised; all are caught and returned as error messages in OutputItem
+
+    Note:
+    -----
+        - The per-request arguments come first, so that callers can bind them once with 
+          functools.partial(process_item_gpt, request_id, total_count)
     """
-    logger.info(msg   = f"Processing item {index + 1} of {total_count}", 
-                extra = {"request_id"    : request_id, 
-                         "batch_id"      : batch_id, 
-                         "batch_item_id" : batch_item_id}
-               )
-    try:
-        # Log the item index which is getting processed
-        logger.info(msg   = f'Processing input item: {index+1} / {total_count}', 
-                    extra = {"request_id": request_id})
+    # Bind the item context once for all log records of this item
+    item_logger = RequestLogger(logger, {"request_id"    : request_id, 
+                                         "batch_id"      : batch_id, 
+                                         "batch_item_id" : batch_item_id})
 
+    # Log the item index which is getting processed
+    item_logger.info("Processing item %d of %d", index + 1, total_count)
+
+    # The validated input is dumped once and shared by the extraction and the output items
+    item_data   = item.model_dump()
+
+    try:
         # Extract information
-        extraction_result = await extract_information(linkedin_post = item.dict())
-        
-        # If any error occurs in extracting information, catch it and return
-        if isinstance(extraction_result, str):
-            logger.warning(msg   = f"Extraction failed for item {index+1}", 
-                           extra = {"request_id": request_id})
-            
-            return [OutputItemGpt(**item.dict(), error = extraction_result)]
-
-        # Define a base structure to align with OutputItem class
-        base_output       = OutputItemGpt(name           = item.name,
-                                          about          = item.about,
-                                          description    = item.description,
-                                          userProfileUrl = item.userProfileUrl,
-                                          source         = item.source,
-                                          searchJobTitle = item.searchJobTitle,
-                                          companyLinks   = item.companyLinks if item.companyLinks != None else [],
-                                          classification = 'Relevant' if extraction_result.get('relevant') else 'Irrelevant',
-                                          error          = f"IrrelevantData: LinkedIn post is Irrelevant in this context, \
-                                                             hence no data has been extracted".replace('  ', '') 
-                                                             if not extraction_result.get('relevant') else None,
-                                         )
+        extraction_result = await extract_information(linkedin_post = item_data)
         
-        # Capture extraction results and populate with objects of OutputItem class
-        extracted_info    = extraction_result.get('extracted_info', [])
-        
-        # If any error occurs in getting extracted_info key, catch it and return
-        if not extracted_info:
-            logger.info(msg   = f"No relevant information extracted for item {index+1}", 
-                        extra = {"request_id": request_id})
-            
-            return [base_output.dict(exclude_none = True)]
-        
-        # Define an empty list to dump all results
-        output_items = list()
-
-        # Iteratively collect all unit results in output_item
-        for info in extracted_info:
-            output_item                = base_output.copy(deep = True)
-            output_item.jobPosterName  = extraction_result.get('poster_name')
-            output_item.jobStarterName = info.get('person_name')
-            output_item.companyName    = info.get('organization') or item.companyName
-            output_item.currentRole    = info.get('new_role')
-            output_items.append(output_item)
-        
-        logger.info(msg   = f'Successfully created response data for item {index+1}', 
-                    extra = {"request_id": request_id})
-        
-        return output_items
+        # Format the extraction result into output items
+        return build_output_items(item_data         = item_data, 
+                                  index             = index, 
+                                  extraction_result = extraction_result, 
+                                  item_logger       = item_logger)
     
     except Exception as ProcessItemError:
-        logger.error(msg      = f"Error processing item {index+1}: {repr(ProcessItemError)}", 
-                     extra    = {"request_id": request_id}, 
-                     exc_info = True)
+        item_logger.error("Error processing item %d: %r", index + 1, ProcessItemError, 
+                          exc_info = True)
         
-        return [OutputItemGpt(**item.dict(), error = f"ProcessItemError: Got error while processing item: {repr(ProcessItemError)}")]
+        return [OutputItemGpt.build_trusted(**item_data, error = f"ProcessItemError: Got error while processing item: {repr(ProcessItemError)}")]
+
+
+async def process_items_gpt(request_id: str, total_count: int, entries: List[Tuple[InputItemGpt, int, int]], batch_id: int, use_batch_api: bool = False) -> List[List[OutputItemGpt]]:
+    """
+    Process several input items of the same request with a single GPT request, falling back to
+    process_item_gpt for a single item, or with one OpenAI Batch API job for offline processing
+
+    Arguments:
+    ----------
+        request_id    { str }      : The request id which is currently getting processed
+
+        total_count   { int }      : The total count of input array in current request 
+
+        entries       { list }     : (item, index, batch_item_id) tuples of the input items to process
+
+        batch_id      { int }      : The id of the current batch
+
+        use_batch_api { bool }     : Submit the items as an OpenAI Batch API job and wait for its 
+                                     results, instead of calling the synchronous endpoint
+        
+    Returns:
+    --------
+        { List[List[OutputItemGpt]] } : The output items of every input item, in the order of entries
+
+    Raises:
+    -------
+        No exceptions has been raised; all are caught and returned as error messages in OutputItem
+    """
+    if ((len(entries) == 1) and (not use_batch_api)):
+        item, index, batch_item_id = entries[0]
+
+        return [await process_item_gpt(request_id, total_count, item, index, batch_id, batch_item_id)]
+
+    item_loggers = [RequestLogger(logger, {"request_id"    : request_id, 
+                                           "batch_id"      : batch_id, 
+                                           "batch_item_id" : batch_item_id}) for _, _, batch_item_id in entries]
+
+    # The item list is only joined if the record is going to be emitted
+    if item_loggers[0].isEnabledFor(logging.INFO):
+        item_loggers[0].info("Processing items %s of %d in one request", ', '.join(str(index + 1) for _, index, _ in entries), total_count)
+
+    # The validated inputs are dumped once and shared by the extraction and the output items
+    items_data   = [item.model_dump() for item, _, _ in entries]
+
+    try:
+        # Extract information of all the items at once
+        extract_items      = extract_information_via_batch_api if use_batch_api else extract_information_batch
+        extraction_results = await extract_items(linkedin_posts = items_data)
+
+    except Exception as ProcessItemsError:
+        extraction_results = [f"ProcessItemError: Got error while processing item: {repr(ProcessItemsError)}"] * len(entries)
+
+    output_items = list()
+
+    for (_, index, _), item_data, extraction_result, item_logger in zip(entries, items_data, extraction_results, item_loggers):
+        try:
+            output_items.append(build_output_items(item_data         = item_data, 
+                                                   index             = index, 
+                                                   extraction_result = extraction_result, 
+                                                   item_logger       = item_logger))
+
+        except Exception as ProcessItemError:
+            item_logger.error("Error processing item %d: %r", index + 1, ProcessItemError, 
+                              exc_info = True)
+        
+            output_items.append([OutputItemGpt.build_trusted(**item_data, error = f"ProcessItemError: Got error while processing item: {repr(ProcessItemError)}")])
+
+    return output_items
@@ -1,13 +1,11 @@
 # DEPENDENCIES
 import logging
-import warnings
+from typing import List
 from pydantic import Field
 from typing import Optional
 from pydantic import BaseModel
-
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+from pydantic import ConfigDict
+from pydantic import TypeAdapter
 
 
 # CONFIGURE THE LOGGING 
@@ -22,6 +20,8 @@ class InputItemGpt(BaseModel):
     All the fields have default empty strings, indicating they are optional
     
     """
+    model_config   = ConfigDict(extra = "ignore")
+
     name           : str            = Field(default = '')   # Name of the input item
     about          : str            = Field(default = '')   # Information about the input item
     description    : str            = Field(default = '')   # Description of the input item
@@ -30,7 +30,6 @@ class InputItemGpt(BaseModel):
     userProfileUrl : Optional[str]  = Field(default = None) # URL of the user profile
     searchJobTitle : Optional[str]  = Field(default = None) # The job title using which data has been searched in LinkedIn
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        logger.debug(msg   = f"InputItemGpt created: {self.dict()}", 
-                     extra = {"request_id": "model_creation"})
\ No newline at end of file
+
+# TYPE ADAPTER TO VALIDATE LISTS OF INPUT ITEMS IN ONE PYDANTIC-CORE CALL
+INPUT_ITEMS_ADAPTER = TypeAdapter(List[InputItemGpt])
@@ -1,13 +1,12 @@
 # DEPENDENCIES
 import logging
-import warnings
 from pydantic import Field
+from typing import List
 from typing import Optional
 from pydantic import BaseModel
-
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+from pydantic import ConfigDict
+from pydantic import field_serializer
+from pydantic import TypeAdapter
 
 
 # CONFIGURE THE LOGGING 
@@ -21,28 +20,41 @@ class OutputItemGpt(BaseModel):
 
     Required fields do not have default values and must be provided
 
-    Optional fields are initialized to None by default and will be excluded if None
+    Optional fields are initialized to None by default and are excluded if None, as the
+    items are always dumped with exclude_none = True
 
     """
+    model_config   = ConfigDict(extra = "ignore")
+
     name           : str                                                            # Name of the output item
     about          : str                                                            # Information about the output item    
     description    : str                                                            # Description of the output item 
     source         : str                                                            # Source of the output item
-    userProfileUrl : Optional[str]   = Field(default = '', exclude_none = True)     # URL of the user profile
-    searchJobTitle : Optional[str]   = Field(default = '', exclude_none = True)     # The job title which has been searched in LinkedIn
-    companyLinks   : Optional[list]  = Field(default = [], exclude_none = True)     # Web Links for the company
-    jobPosterName  : Optional[str]   = Field(default = None, exclude_none = True)   # Name of the job poster (optional)
-    jobStarterName : Optional[str]   = Field(default = None, exclude_none = True)   # Name of the job starter (optional)
-    companyName    : Optional[str]   = Field(default = None, exclude_none = True)   # Name of the company (optional)
-    currentRole    : Optional[str]   = Field(default = None, exclude_none = True)   # Current role of the user (optional)
-    classification : Optional[str]   = Field(default = None, exclude_none = True)   # Classification decision (optional)
-    error          : Optional[str]   = Field(default = None, exclude_none = True)   # Error message, if any (optional)
-
-    class Config:
-        json_encoders = {Optional[str]   : lambda v: v or None,
-                         Optional[float] : lambda v: v or None
-                        }
-    def __init__(self, **data):
-        super().__init__(**data)
-        logger.debug(msg   = f"OutputItemGpt created: {self.dict()}", 
-                     extra = {"request_id": "model_creation"})
+    userProfileUrl : Optional[str]   = Field(default = '')                          # URL of the user profile
+    searchJobTitle : Optional[str]   = Field(default = '')                          # The job title which has been searched in LinkedIn
+    companyLinks   : Optional[list]  = Field(default_factory = list)                # Web Links for the company
+    jobPosterName  : Optional[str]   = Field(default = None)                        # Name of the job poster (optional)
+    jobStarterName : Optional[str]   = Field(default = None)                        # Name of the job starter (optional)
+    companyName    : Optional[str]   = Field(default = None)                        # Name of the company (optional)
+    currentRole    : Optional[str]   = Field(default = None)                        # Current role of the user (optional)
+    classification : Optional[str]   = Field(default = None)                        # Classification decision (optional)
+    error          : Optional[str]   = Field(default = None)                        # Error message, if any (optional)
+
+    @classmethod
+    def build_trusted(cls, **data) -> "OutputItemGpt":
+        """
+        Build an output item from data the pipeline itself produced (validated input fields and
+        internally assembled values) WITHOUT running any validation; the caller is responsible 
+        for the field types, so never pass raw external input here
+        """
+        return cls.model_construct(**data)
+
+    # Empty optional strings are written as null in JSON output, as the former json_encoders did
+    @field_serializer('userProfileUrl', 'searchJobTitle', 'jobPosterName', 'jobStarterName', 'companyName', 'currentRole', 'classification', 'error', 
+                      when_used = 'json')
+    def serialize_empty_as_null(self, value: Optional[str]) -> Optional[str]:
+        return value or None
+
+
+# TYPE ADAPTER TO VALIDATE / SERIALIZE LISTS OF OUTPUT ITEMS IN ONE CALL
+OUTPUT_ITEMS_ADAPTER = TypeAdapter(List[OutputItemGpt])
@@ -0,0 +1,111 @@
+# DEPENDENCIES
+import asyncio
+import logging
+from .model_config import RPM_LIMIT
+from .model_config import MAX_CONCURRENCY
+
+
+# LOGGING
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for requests per minute
+
+    The bucket refills continuously at rpm / 60 tokens per second up to its capacity; every
+    request takes one token and waits until one is available, so bursts are smoothed out to
+    the configured rate instead of running into 429 responses
+    """
+    def __init__(self, rpm: float, capacity: float = None):
+        """
+        Initialize the TokenBucket
+
+        Arguments:
+        ----------
+            rpm      { float } : Maximum number of requests per minute
+
+            capacity { float } : Maximum burst size, defaults to one second worth of requests
+        """
+        self.rate        = rpm / 60
+        self.capacity    = capacity or max(1.0, self.rate)
+        self.tokens      = self.capacity
+        self.last_refill = None
+
+
+    async def acquire(self) -> None:
+        """
+        Take a token, waiting until it is available; waiters are served in arrival order
+
+        Every caller reserves its token right away (the balance may go negative) and then sleeps 
+        until the reserved token has been refilled. The reservation has no await in between, so 
+        it is atomic on the event loop and no lock is held while sleeping
+        """
+        now = asyncio.get_running_loop().time()
+
+        if self.last_refill is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+
+        self.last_refill  = now
+        self.tokens      -= 1
+
+        if (self.tokens >= 0):
+            return
+
+        try:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+        except asyncio.CancelledError:
+            # Hand the reserved token back to the waiters behind
+            self.tokens += 1
+            raise
+
+
+# SHARED LIMITS OF THE GPT REQUESTS OF THIS PROCESS, CREATED LAZILY ON THE EVENT LOOP WHICH FIRST USES THEM
+_gpt_request_semaphore = None
+_gpt_request_bucket    = None
+
+# NUMBER OF PROCESSES SPLITTING THE ACCOUNT-WIDE RPM_LIMIT BETWEEN THEM
+_rate_limit_shares     = 1
+
+
+def share_rate_limit(process_count: int) -> None:
+    """
+    Split RPM_LIMIT evenly between the processes calling the OpenAI API with the same account 
+    (e.g. the Uvicorn workers), so that together they stay within the account limit
+
+    Arguments:
+    ----------
+        process_count { int } : Number of processes sharing the account
+    """
+    global _rate_limit_shares
+
+    if _gpt_request_bucket is not None:
+        raise RuntimeError("The rate limit must be shared before the first GPT request")
+
+    _rate_limit_shares = max(1, process_count)
+
+
+def get_gpt_request_semaphore() -> asyncio.Semaphore:
+    """
+    Returns the process-wide semaphore bounding the GPT requests in flight to MAX_CONCURRENCY
+    """
+    global _gpt_request_semaphore
+
+    if _gpt_request_semaphore is None:
+        _gpt_request_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    return _gpt_request_semaphore
+
+
+def get_gpt_request_bucket() -> TokenBucket:
+    """
+    Returns the process-wide token bucket keeping the GPT requests of this process within its 
+    share of RPM_LIMIT
+    """
+    global _gpt_request_bucket
+
+    if _gpt_request_bucket is None:
+        _gpt_request_bucket = TokenBucket(rpm = RPM_LIMIT / _rate_limit_shares)
+
+    return _gpt_request_bucket
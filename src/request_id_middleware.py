@@ -1,22 +1,42 @@
 # DEPENDENCIES
-from fastapi import Request
+import itertools
 from starlette.types import Scope
 from starlette.types import Send
 from starlette.types import ASGIApp
+from starlette.types import Message
 from starlette.types import Receive
-from starlette.middleware.base import BaseHTTPMiddleware
+from .logging_config import REQUEST_ID
 
 
 # REQUEST COUNTER MIDDLEWARE
-class RequestIDMiddleware(BaseHTTPMiddleware):
+class RequestIDMiddleware:
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.counter = 0
-
-    async def dispatch(self, request: Request, call_next):
-        self.counter                    += 1
-        request_id                       = self.counter
-        request.state.request_id         = request_id
-        response                         = await call_next(request)
-        response.headers["X-Request-ID"] = str(request_id)
-        return response
\ No newline at end of file
+        self.app     = app
+        self.next_id = itertools.count(1).__next__
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (scope["type"] != "http"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id                                    = self.next_id()
+        scope.setdefault("state", {})["request_id"]   = request_id
+        request_id_text                               = str(request_id)
+        request_id_header                             = (b"x-request-id", request_id_text.encode())
+
+        async def send_with_request_id(message: Message):
+            if (message["type"] == "http.response.start"):
+                # Append the raw header pair to a copy of the message, without wrapping it in a MutableHeaders 
+                # view; the message itself may be shared, like the pre-built 503 response of the ShutdownMiddleware
+                message = {**message, "headers": [*message.get("headers", ()), request_id_header]}
+
+            await send(message)
+
+        # Every record logged while handling the request picks the id up from the context
+        token                                         = REQUEST_ID.set(request_id_text)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+
+        finally:
+            REQUEST_ID.reset(token)
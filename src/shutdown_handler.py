@@ -1,17 +1,27 @@
 # DEPENDENCIES
+import signal
 import logging
 import asyncio
-import warnings
-
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+import threading
+from .shutdown_middleware import shutdown_event
+from .shutdown_middleware import wait_for_requests_drained
 
 
 # CONFIGURE THE LOGGING 
 logger = logging.getLogger(__name__)
 
 
+# UPPER BOUND IN SECONDS OF THE WAIT FOR THE IN-FLIGHT REQUESTS ON SHUTDOWN
+SHUTDOWN_GRACE_PERIOD = 5
+
+
+# EVENT LOOP OF THIS WORKER, CAPTURED WHEN THE SIGNAL HANDLERS ARE INSTALLED
+shutdown_loop  = None
+
+# STRONG REFERENCES TO THE RUNNING SHUTDOWN TASKS, THE LOOP ONLY KEEPS WEAK ONES
+shutdown_tasks = set()
+
+
 def handle_shutdown_signal(signal, frame):
     """
     Handles OS shutdown signals (SIGINT, SIGTERM)
@@ -20,14 +30,56 @@ def handle_shutdown_signal(signal, frame):
     logger.info(msg   = "Shutdown signal received", 
                 extra = {"request_id": "shutdown"})
     
-    # Get the current event loop
-    loop = asyncio.get_event_loop()
+    # A signal handler may interrupt the loop at any point, so the shutdown task is not created 
+    # here but handed over to the loop through its thread-safe (self-pipe) callback queue
+    if ((shutdown_loop is not None) and (not shutdown_loop.is_closed())):
+        shutdown_loop.call_soon_threadsafe(start_shutdown_task)
 
-    if loop.is_running():
-        loop.create_task(handle_shutdown_event())
-    
-    else:
-        loop.run_until_complete(handle_shutdown_event())
+
+def start_shutdown_task():
+    """
+    Starts handle_shutdown_event on the worker's event loop, called back by the loop itself
+
+    """
+    shutdown_task = asyncio.create_task(handle_shutdown_event())
+
+    shutdown_tasks.add(shutdown_task)
+    shutdown_task.add_done_callback(shutdown_tasks.discard)
+
+
+def install_shutdown_signal_handlers():
+    """
+    Registers handle_shutdown_signal for SIGINT and SIGTERM in the current (worker) process
+
+    Any previously installed Python-level handler, like the server's own exit handler, 
+    is chained so that it still runs after ours. Signal handlers can only be installed 
+    from the main thread, so this is a no-op anywhere else
+
+    Must be called from a coroutine (the startup event): the running loop is captured to 
+    schedule the shutdown on. loop.add_signal_handler is not used on purpose, it would 
+    replace the handler uvicorn registered the same way instead of chaining it
+
+    Works the same on the uvloop loop, which the server picks (loop = "auto") whenever it is 
+    installed: uvloop also wakes up on the C-level signal through its own wakeup fd and 
+    implements call_soon_threadsafe, so neither uvicorn's handler nor ours is affected
+    """
+    global shutdown_loop
+
+    if (threading.current_thread() is not threading.main_thread()):
+        return
+
+    shutdown_loop = asyncio.get_running_loop()
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        previous_handler = signal.getsignal(signal_number)
+
+        def chained_handler(signal_number, frame, previous_handler = previous_handler):
+            handle_shutdown_signal(signal_number, frame)
+
+            if callable(previous_handler):
+                previous_handler(signal_number, frame)
+
+        signal.signal(signal_number, chained_handler)
 
 
 async def handle_shutdown_event():
@@ -40,10 +92,14 @@ async def handle_shutdown_event():
     logger.info(msg   = "Running shutdown event handler", 
                 extra = {"request_id": "shutdown"})
     
-     # Perform any necessary cleanup here and 
-     # give some time to perform the cleanup process properly
-    await asyncio.sleep(delay = 5)  
-    #handle_shutdown_signal()
+    # Stop accepting new requests, the ShutdownMiddleware answers them with 503
+    shutdown_event.set()
+
+    # Give the requests in flight up to SHUTDOWN_GRACE_PERIOD seconds to finish, instead of always 
+    # sleeping for the whole grace period
+    if (not await wait_for_requests_drained(timeout = SHUTDOWN_GRACE_PERIOD)):
+        logger.warning(msg   = f"Requests still in flight after {SHUTDOWN_GRACE_PERIOD} seconds, shutting down anyway", 
+                       extra = {"request_id": "shutdown"})
 
     logger.info(msg   = "Shutdown complete", 
                 extra = {"request_id": "shutdown"})
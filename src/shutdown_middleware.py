@@ -1,20 +1,40 @@
 # DEPENDENCIES
+import asyncio
 import logging
-import warnings
-from fastapi import FastAPI
-from starlette.responses import PlainTextResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-
-
-# IGNORE ALL WARNINGS 
-warnings.filterwarnings(action = 'ignore')
+from starlette.types import Scope
+from starlette.types import Send
+from starlette.types import ASGIApp
+from starlette.types import Receive
 
 
 # LOGGING 
 logger = logging.getLogger(__name__)
 
 
-class ShutdownMiddleware(BaseHTTPMiddleware):
+# SHUTDOWN FLAG SHARED WITH THE SHUTDOWN HANDLER
+shutdown_event    = asyncio.Event()
+
+# NUMBER OF HTTP REQUESTS BEING PROCESSED, AND THE EVENT SET ONCE THEY ARE DONE DURING SHUTDOWN
+inflight_requests = 0
+requests_drained  = asyncio.Event()
+
+
+# PRE-BUILT 503 RESPONSE MESSAGES, SENT AS THEY ARE TO EVERY REQUEST ARRIVING DURING SHUTDOWN
+SHUTDOWN_RESPONSE_BODY  = b"Server is shutting down"
+
+SHUTDOWN_RESPONSE_START = {"type"    : "http.response.start",
+                           "status"  : 503,
+                           "headers" : [(b"content-type",   b"text/plain; charset=utf-8"),
+                                        (b"content-length", str(len(SHUTDOWN_RESPONSE_BODY)).encode()),
+                                       ],
+                          }
+
+SHUTDOWN_RESPONSE_END   = {"type" : "http.response.body",
+                           "body" : SHUTDOWN_RESPONSE_BODY,
+                          }
+
+
+class ShutdownMiddleware:
     """
     Middleware to handle graceful shutdown of the FastAPI application
 
@@ -22,42 +42,79 @@ class ShutdownMiddleware(BaseHTTPMiddleware):
     is in the process of shutting down. If so, it returns a 503 Service
     Unavailable response instead of processing the request
     """
-    def __init__(self, app: FastAPI):
+    def __init__(self, app: ASGIApp):
         """
         Initialize the ShutdownMiddleware
 
         Arguments:
         ----------
-            app : The FastAPI application instance
+            app : The ASGI application wrapped by this middleware
         """
-        super().__init__(app)
-        self.is_shutting_down = False
+        self.app = app
         logger.info(msg = "ShutdownMiddleware initialized")
 
-    async def dispatch(self, request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
-        Dispatch method to handle incoming requests
+        ASGI entry point to handle incoming requests
 
-        This method checks if the server is shutting down. If it is, it returns a 503 response.
-        Otherwise, it passes the request to the next middleware or route handler
+        This method checks if the server is shutting down. If it is, it sends a 503 response
+        directly. Otherwise, it passes the request to the next middleware or route handler, 
+        counting it as in flight until it has been answered
 
         Arguments:
         ----------
-            request : The incoming request object
-            call_next : Callable to pass the request to the next middleware or route handler
+            scope   : The ASGI connection scope
+
+            receive : ASGI callable to receive messages from the client
 
-        Returns:
-        --------
-            { PlainTextResponse } : A PlainTextResponse with a 503 status code if the server is shutting down,
-                                    otherwise the response from the next middleware or route handler
+            send    : ASGI callable to send messages to the client
         """
-        if self.is_shutting_down:
-            logger.warning(msg   = "Server is shutting down, returning 503 response", 
-                           extra = {"request_id": str(request.state.request_id)})
+        global inflight_requests
+
+        if (scope["type"] != "http"):
+            await self.app(scope, receive, send)
+            return
+
+        if shutdown_event.is_set():
+            logger.warning(msg = "Server is shutting down, returning 503 response")
             
-            return PlainTextResponse("Server is shutting down", status_code=503)
-        
-        logger.debug(msg   = "Processing request", 
-                     extra = {"request_id": str(request.state.request_id)})
-        
-        return await call_next(request)
+            await send(SHUTDOWN_RESPONSE_START)
+            await send(SHUTDOWN_RESPONSE_END)
+            return
+
+        logger.debug(msg = "Processing request")
+
+        # Count the request as in flight, the last one finishing after shutdown has started sets requests_drained
+        inflight_requests += 1
+
+        try:
+            await self.app(scope, receive, send)
+
+        finally:
+            inflight_requests -= 1
+
+            if ((inflight_requests == 0) and shutdown_event.is_set()):
+                requests_drained.set()
+
+
+async def wait_for_requests_drained(timeout: float) -> bool:
+    """
+    Wait until the HTTP requests in flight have finished, at most timeout seconds
+
+    Arguments:
+    ----------
+        timeout { float } : Maximum number of seconds to wait
+
+    Returns:
+    --------
+            { bool }      : True if all requests finished, False if the wait timed out
+    """
+    if (inflight_requests == 0):
+        return True
+
+    try:
+        await asyncio.wait_for(requests_drained.wait(), timeout = timeout)
+        return True
+
+    except asyncio.TimeoutError:
+        return False
@@ -0,0 +1,74 @@
+# DEPENDENCIES
+import unittest
+from src.batch_scheduler import BatchScheduler
+
+
+# HELPER : FEED ONE WINDOW OF BACK TO BACK BATCHES TO THE SCHEDULER
+def feed_window(scheduler: BatchScheduler, latency: float, batch_length: int, start: float = 0.0) -> float:
+    started = start
+
+    for _ in range(scheduler.recent_batches.maxlen):
+        scheduler._adapt_batch_size(batch_length = batch_length,
+                                    started      = started,
+                                    finished     = started + latency)
+        started += latency
+
+    return started
+
+
+class TestAdaptBatchSize(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = BatchScheduler(max_batch_size = 20,
+                                        max_wait_ms    = 50,
+                                        latency_window = 4)
+
+
+    def test_first_window_only_sets_the_baseline(self):
+        feed_window(self.scheduler, latency = 1.0, batch_length = 10)
+
+        self.assertEqual(self.scheduler.batch_size, 20)
+        self.assertIsNotNone(self.scheduler.baseline)
+
+
+    def test_shrinks_when_latency_grows_faster_than_throughput(self):
+        end = feed_window(self.scheduler, latency = 1.0, batch_length = 10)
+        feed_window(self.scheduler, latency = 2.0, batch_length = 10, start = end)
+
+        self.assertEqual(self.scheduler.batch_size, 19)
+
+
+    def test_grows_when_throughput_keeps_up_with_latency(self):
+        self.scheduler.batch_size = 10
+
+        end = feed_window(self.scheduler, latency = 2.0, batch_length = 10)
+        feed_window(self.scheduler, latency = 1.0, batch_length = 10, start = end)
+
+        self.assertEqual(self.scheduler.batch_size, 11)
+
+
+    def test_holds_within_the_tolerance_band(self):
+        self.scheduler.batch_size = 10
+
+        # Latency up 10 % with the throughput unchanged (10 % more items per batch)
+        end = feed_window(self.scheduler, latency = 1.0, batch_length = 10)
+        feed_window(self.scheduler, latency = 1.1, batch_length = 11, start = end)
+
+        self.assertEqual(self.scheduler.batch_size, 10)
+
+
+    def test_never_leaves_the_bounds(self):
+        end = feed_window(self.scheduler, latency = 1.0, batch_length = 10)
+        feed_window(self.scheduler, latency = 0.5, batch_length = 10, start = end)
+
+        self.assertEqual(self.scheduler.batch_size, 20)
+
+        self.scheduler.batch_size = 1
+
+        end = feed_window(self.scheduler, latency = 1.0, batch_length = 10, start = 100.0)
+        feed_window(self.scheduler, latency = 4.0, batch_length = 10, start = end)
+
+        self.assertEqual(self.scheduler.batch_size, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()